@@ -1,19 +1,17 @@
-import random
-import sys
 import numpy as np
 
+import batch
 import minesweeper
-# Raise recursion limit to avoid RecursionError on bigger boards
-sys.setrecursionlimit(2**16)
 
 
 class DQEnvironment(object):
-    def __init__(self, bomb_count, board_size):
+    def __init__(self, bomb_count, board_size, seed=None):
         self.board_size = board_size
         self.bomb_count = bomb_count
-        first_r = random.randint(1, board_size - 1)
-        first_c = random.randint(1, board_size - 1)
+        self.rng = np.random.default_rng(seed)
         self.board = np.zeros((board_size, board_size))
+        self.counts = np.zeros((board_size, board_size), dtype=np.int8)
+        self.status = minesweeper.GameStatus(board_size, bomb_count)
         self.board_state = np.zeros((board_size, board_size))
         self.rewards = {
             "win": 1,
@@ -57,26 +55,29 @@ class DQEnvironment(object):
                 return False
         return True
 
+    """output a flat boolean mask of the actions that open an unopened tile."""
+
+    def valid_actions(self):
+        return np.asarray(self.board_state).ravel() == self.UNOPENED
+
     def step(self, action):
-        old_board_state = self.board_state
+        old_board_state = self.board_state.copy()
         done = False
         action_row = action // self.board_size
         action_col = action % self.board_size
-        new_board_state = minesweeper.open_tile(
-            old_board_state, self.board, action_row, action_col
+        opened = minesweeper.reveal(
+            self.board_state, self.board, action_row, action_col, self.counts
         )
-        self.board_state = new_board_state
+        self.status.record_open(self.board, opened)
         guessed = self.is_guess(action_row, action_col, old_board_state)
 
         # lose condition
-        if minesweeper.game_lost(self.board, self.board_state):
+        if self.status.lost():
             reward = self.rewards["lose"]
             done = True
             self.total += 1
         # win condition
-        elif (
-            minesweeper.game_won(self.board_state, self.bomb_count)
-        ):
+        elif self.status.won():
             reward = self.rewards["win"]
             print("game won!!!")
             done = True
@@ -98,11 +99,103 @@ class DQEnvironment(object):
         return self.board_state, reward, done
 
     def reset(self):
-        first_r = random.randint(1, self.board_size - 1)
-        first_c = random.randint(1, self.board_size - 1)
-        self.board = minesweeper.init_board(
-            self.board_size, self.bomb_count, first_r, first_c
+        first_r = self.rng.integers(1, self.board_size)
+        first_c = self.rng.integers(1, self.board_size)
+        self.board, self.counts = minesweeper.init_board(
+            self.board_size,
+            self.bomb_count,
+            first_r,
+            first_c,
+            return_counts=True,
+            rng=self.rng,
         )
-        self.board_state = minesweeper.open_tile(
-            minesweeper.init_board_state(self.board_size), self.board, first_r, first_c
+        self.board_state = minesweeper.init_board_state(self.board_size)
+        self.status = minesweeper.GameStatus(self.board_size, self.bomb_count)
+        opened = minesweeper.reveal(
+            self.board_state, self.board, first_r, first_c, self.counts
         )
+        self.status.record_open(self.board, opened)
+
+
+"""K minesweeper environments stepped in lockstep on a batch.BatchBoards, so that the
+policy can pick the actions of all K boards with one batched forward pass. step takes one
+action per board and outputs the stacked (K, H, W) board states, the K rewards and the K
+done flags, with the same rewards as DQEnvironment. Finished boards are reset right away,
+so the board states output for them are the first states of their new games; their last
+board states are kept in final_state."""
+
+
+class VecDQEnvironment(object):
+    def __init__(self, num_envs, bomb_count, board_size, seed=None):
+        self.num_envs = num_envs
+        self.board_size = board_size
+        self.bomb_count = bomb_count
+        self.rng = np.random.default_rng(seed)
+        self.boards = batch.BatchBoards(num_envs, board_size, bomb_count, self.rng)
+        self.final_state = np.zeros_like(self.boards.state)
+        self.rewards = {
+            "win": 1,
+            "lose": -0.5,
+            "progress": 0.9,
+            "guess": -0.1,
+            "no_progress": -1000,
+        }
+        self.wins = 0
+        self.total = 0
+        self.progress = 0
+        self.total_moves = 0
+
+    @property
+    def board_state(self):
+        return self.boards.state
+
+    """output a (K, H * W) boolean mask of the actions that open an unopened tile."""
+
+    def valid_actions(self):
+        return self.boards.state.reshape(self.num_envs, -1) == minesweeper.unopened
+
+    """start a new game on every board selected by the boolean [mask], or on all boards,
+    by opening a random first tile as DQEnvironment.reset does."""
+
+    def reset(self, mask=None):
+        first_r = self.rng.integers(1, self.board_size, self.num_envs)
+        first_c = self.rng.integers(1, self.board_size, self.num_envs)
+        self.boards.reset(first_r, first_c, mask)
+        self.boards.open(first_r, first_c, mask)
+        return self.boards.state.copy()
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        rows = actions // self.board_size
+        cols = actions % self.board_size
+        envs = np.arange(self.num_envs)
+        old_board_state = self.boards.state
+        already_opened = old_board_state[envs, rows, cols] >= 0
+        opened_neighbours = minesweeper.neighbour_sum(old_board_state >= 0)
+        guessed = opened_neighbours[envs, rows, cols] == 0
+
+        self.boards.open(rows, cols)
+        lost = self.boards.lost()
+        won = self.boards.won()
+        done = lost | won
+
+        # lose, then win, no progress, guess and progress conditions
+        rewards = np.select(
+            [lost, won, already_opened, guessed],
+            [
+                self.rewards["lose"],
+                self.rewards["win"],
+                self.rewards["no_progress"],
+                self.rewards["guess"],
+            ],
+            self.rewards["progress"],
+        )
+        self.wins += int(won.sum())
+        self.total += int(done.sum())
+        self.progress += int((~lost & (won | ~already_opened)).sum())
+        self.total_moves += self.num_envs
+
+        if done.any():
+            self.final_state[done] = self.boards.state[done]
+            self.reset(done)
+        return self.boards.state.copy(), rewards, done
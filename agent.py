@@ -1,6 +1,3 @@
-from collections import namedtuple, deque
-from itertools import count
-import random
 import time
 import gymnasium as gym
 import matplotlib
@@ -13,12 +10,15 @@ import torch.nn as nn
 
 import DQN_Env
 import network
+import replay_memory
 
 NUM_TILES = 22
 NUM_MINES = 99
+# number of boards played in lockstep, so one forward pass picks the actions of all of them
+NUM_ENVS = 16
 start_time = time.time()
 
-env = DQN_Env.DQEnvironment(NUM_MINES, NUM_TILES)
+env = DQN_Env.VecDQEnvironment(NUM_ENVS, NUM_MINES, NUM_TILES)
 
 is_ipython = 'inline' in matplotlib.get_backend()
 if is_ipython:
@@ -29,35 +29,26 @@ plt.ion()
 #use GPU instead of CPU
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-Transition = namedtuple('Transition',
-                        ('state', 'action', 'next_state', 'reward'))
-
-
-#class to store periods of batches
-class ReplayMemory(object):
-
-    def __init__(self, capacity):
-        self.memory = deque([], maxlen=capacity)
-
-    def push(self, *args):
-        """Save a transition"""
-        self.memory.append(Transition(*args))
-
-    def sample(self, batch_size):
-        return random.sample(self.memory, batch_size)
-
-    def __len__(self):
-        return len(self.memory)
-    
 #Parameters
 BATCH_SIZE = 64
 GAMMA = 0.99
 EPS_START = 0.9
 EPS_END = 1e-10
 EPS_DECAY = 10000
+# steps_done, EPS_DECAY, BETA_FRAMES and TARGET_UPDATE_EVERY count transitions, not batched
+# steps, so one step of the NUM_ENVS boards advances them all by NUM_ENVS
 TAU = 0.005
+# apply the soft update of the target network once at least TARGET_UPDATE_EVERY transitions
+# were collected since the last one, with TAU compounded over those transitions
+TARGET_UPDATE_EVERY = 1
+# gradient steps per batched step; NUM_ENVS keeps one gradient step per transition
+OPTIMIZE_STEPS_PER_BATCH = NUM_ENVS
 LR = 1e-4
 DENSE_CHANNELS = 512
+MEMORY_CAPACITY = 1000000
+PRIORITIZED_REPLAY = True
+BETA_START = 0.4
+BETA_FRAMES = 100000
 
 n_actions, n_observations = env.board_size, env.board_size
 env.reset()
@@ -67,27 +58,34 @@ target_net = network.DQN(n_observations ** 2, n_actions ** 2, n_observations **
 target_net.load_state_dict(policy_net.state_dict())
 
 optimizer = optim.AdamW(policy_net.parameters(), lr=LR, amsgrad=True)
-memory = ReplayMemory(10000)
+if PRIORITIZED_REPLAY:
+    memory = replay_memory.PrioritizedReplayMemory(MEMORY_CAPACITY, n_observations ** 2, device, beta=BETA_START)
+else:
+    memory = replay_memory.TensorReplayMemory(MEMORY_CAPACITY, n_observations ** 2, device)
 
 
 steps_done = 0
 
+#the actions that open an unopened tile, for a batch of flattened board states
+def valid_action_mask(state):
+    return state == -1
+
+
 #Code from https://pytorch.org/tutorials/intermediate/reinforcement_q_learning.html
+#picks one action per board for a (NUM_ENVS, tiles) batch of states
 def select_action(state):
     global steps_done
-    sample = random.random()
     eps_threshold = EPS_END + (EPS_START - EPS_END) * \
         math.exp(-1. * steps_done / EPS_DECAY)
-    steps_done += 1
-    if sample > eps_threshold:
-        with torch.no_grad():
-            return policy_net(state).max(1)[1].view(1, 1)
-    else:
-        rand_list = []
-        for r in range(env.board_size):
-            for c in range(env.board_size):
-                if env.board_state[r][c] == -1: rand_list.append(r * env.board_size + c)
-        return torch.tensor([[random.choice(rand_list)]], device=device, dtype=torch.long)
+    steps_done += state.size(0)
+    valid = valid_action_mask(state)
+    with torch.no_grad():
+        greedy = policy_net(state).masked_fill(~valid, -math.inf).max(1)[1]
+    # a random unopened tile of every board
+    random_scores = torch.rand(state.shape, device=device).masked_fill(~valid, -1)
+    random_action = random_scores.max(1)[1]
+    explore = torch.rand(state.size(0), device=device) <= eps_threshold
+    return torch.where(explore, random_action, greedy).view(-1, 1)
 
 
 episode_durations = []
@@ -120,23 +118,20 @@ def plot_durations(show_result=False):
 def optimize_model():
     if len(memory) < BATCH_SIZE:
         return
-    transitions = memory.sample(BATCH_SIZE)
-    batch = Transition(*zip(*transitions))
-    non_final_mask = torch.tensor(tuple(map(lambda s: s is not None,
-                                          batch.next_state)), device=device, dtype=torch.bool)
-    non_final_next_states = torch.cat([s for s in batch.next_state
-                                                if s is not None])
-    state_batch = torch.cat(batch.state)
-    action_batch = torch.cat(batch.action)
-    reward_batch = torch.cat(batch.reward)
+    # anneal the importance sampling correction of prioritized replay towards 1
+    memory.beta = min(1.0, BETA_START + (1.0 - BETA_START) * steps_done / BETA_FRAMES)
+    state_batch, action_batch, reward_batch, next_state_batch, done_batch, weights, indices = memory.sample(BATCH_SIZE)
     state_action_values = policy_net(state_batch).gather(1, action_batch)
-    next_state_values = torch.zeros(BATCH_SIZE, device=device)
     with torch.no_grad():
-        next_state_values[non_final_mask] = target_net(non_final_next_states).max(1)[0]
+        next_q_values = target_net(next_state_batch).masked_fill(~valid_action_mask(next_state_batch), -math.inf)
+        next_state_values = next_q_values.max(1)[0]
+    next_state_values.masked_fill_(done_batch, 0)
     expected_state_action_values = (next_state_values * GAMMA) + reward_batch
 
-    criterion = nn.SmoothL1Loss()
-    loss = criterion(state_action_values, expected_state_action_values.unsqueeze(1))
+    criterion = nn.SmoothL1Loss(reduction='none')
+    losses = criterion(state_action_values, expected_state_action_values.unsqueeze(1)).squeeze(1)
+    loss = (losses * weights).mean()
+    memory.update_priorities(indices, state_action_values.squeeze(1) - expected_state_action_values)
 
     optimizer.zero_grad()
     loss.backward()
@@ -150,47 +145,44 @@ else:
     num_episodes = 200
 
 most_opened = 0
-for i_episode in range(num_episodes):
-    if i_episode % 50 == 0: print(f"episode {i_episode}")
-  
-    env.reset()
-    state = env.board_state.flatten('C')
-    state = torch.tensor(state, dtype=torch.float32, device=device).unsqueeze(0)
-    for t in count():
-        action = select_action(state)
-        board_state, reward, done = env.step(action.item())
-        board_state = board_state.flatten('C') #flatten input for model
-        reward = torch.tensor([reward], device=device)
-        
-        if done:
-            next_state = None
-        else:
-            next_state = torch.tensor(board_state, dtype=torch.float32, device=device).unsqueeze(0)
-
-        memory.push(state, action, next_state, reward)
-        state = next_state
-
+last_target_update = 0
+i_episode = 0
+episode_steps = [0] * NUM_ENVS
+state = env.reset().reshape(NUM_ENVS, -1)
+state = torch.tensor(state, dtype=torch.float32, device=device)
+while i_episode < num_episodes:
+    action = select_action(state)
+    board_state, reward, done = env.step(action.view(-1).cpu().numpy())
+    board_state = board_state.reshape(NUM_ENVS, -1) #flatten input for model
+    next_state = torch.tensor(board_state, dtype=torch.float32, device=device)
+    reward = torch.tensor(reward, dtype=torch.float32, device=device)
+
+    memory.push(state, action, next_state, reward, torch.from_numpy(done))
+    # finished boards were reset, so their next state starts a new episode
+    state = next_state
+
+    for _ in range(OPTIMIZE_STEPS_PER_BATCH):
         optimize_model()
 
-        target_net_state_dict = target_net.state_dict()
-        policy_net_state_dict = policy_net.state_dict()
-        for key in policy_net_state_dict:
-            target_net_state_dict[key] = policy_net_state_dict[key]*TAU + target_net_state_dict[key]*(1-TAU)
-        target_net.load_state_dict(target_net_state_dict)
-
-        if done:
-            opened = 0
-            for r in range(env.board_size):
-                for c in range(env.board_size):
-                    if env.board_state[r][c] in range(0, 9):
-                        opened += 1
-            print(opened)
-            if opened > most_opened:
-                most_opened = opened
-                print(f"the new highest count is {most_opened}")
-            episode_durations.append(t + 1)
-            plot_durations()
-            break
+    if steps_done - last_target_update >= TARGET_UPDATE_EVERY:
+        network.soft_update(target_net, policy_net, network.soft_update_tau(TAU, steps_done - last_target_update))
+        last_target_update = steps_done
+
+    for k in range(NUM_ENVS):
+        episode_steps[k] += 1
+        if not done[k]:
+            continue
+        if i_episode % 50 == 0: print(f"episode {i_episode}")
+        opened = int((env.final_state[k] >= 0).sum())
+        print(opened)
+        if opened > most_opened:
+            most_opened = opened
+            print(f"the new highest count is {most_opened}")
+        episode_durations.append(episode_steps[k])
+        episode_steps[k] = 0
+        i_episode += 1
+    if done.any():
+        plot_durations()
 end_time = time.time()
 print('Time took to train: ', end_time - start_time, ' seconds')
 torch.save(policy_net, 'model2.pt')
@@ -0,0 +1,104 @@
+import numpy as np
+
+import minesweeper
+
+"""N minesweeper games of the same size and mine count played in lockstep. The mines, the
+amount of surrounding bombs and the board states of all games are held as (N, size, size)
+arrays, every operation takes one tile per game and works on all games at once, and the
+outcome of each game is kept up to date in running counters. A boolean [mask] of length N
+restricts an operation to some of the games."""
+
+
+class BatchBoards(object):
+    def __init__(self, n, size, bomb_count, rng=None):
+        self.n = n
+        self.size = size
+        self.bomb_count = bomb_count
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.mines = np.zeros((n, size, size), dtype=np.uint8)
+        self.counts = np.zeros((n, size, size), dtype=np.uint8)
+        self.state = np.full((n, size, size), minesweeper.unopened, dtype=np.int8)
+        self.opened_empty = np.zeros(n, dtype=np.int64)
+        self.mine_hit = np.zeros(n, dtype=bool)
+
+    def select(self, mask):
+        if mask is None:
+            return np.arange(self.n)
+        return np.flatnonzero(mask)
+
+    """place new mines in the selected games so that the tile (rows[i], cols[i]) of game i is
+    never a mine, and set all of their tiles back to unopened."""
+
+    def reset(self, rows, cols, mask=None):
+        games = self.select(mask)
+        if games.size == 0:
+            return
+        tiles = self.size * self.size
+        first = np.asarray(rows)[games] * self.size + np.asarray(cols)[games]
+        keys = self.rng.random((games.size, tiles))
+        keys[np.arange(games.size), first] = np.inf
+        bombs = np.argpartition(keys, self.bomb_count - 1, axis=1)[:, : self.bomb_count]
+        mines = np.zeros((games.size, tiles), dtype=np.uint8)
+        mines[np.arange(games.size)[:, None], bombs] = minesweeper.mine
+        self.mines[games] = mines.reshape(games.size, self.size, self.size)
+        self.counts[games] = minesweeper.neighbour_sum(self.mines[games])
+        self.state[games] = minesweeper.unopened
+        self.opened_empty[games] = 0
+        self.mine_hit[games] = False
+
+    """open the tile (rows[i], cols[i]) of every selected game, flood filling from tiles with
+    no surrounding bombs one ring of neighbours at a time for all games at once. Output an
+    (N, size, size) mask of the newly opened tiles."""
+
+    def open(self, rows, cols, mask=None):
+        games = self.select(mask)
+        rows = np.asarray(rows)[games]
+        cols = np.asarray(cols)[games]
+        keep = self.state[games, rows, cols] != minesweeper.flaged
+        games, rows, cols = games[keep], rows[keep], cols[keep]
+
+        region = np.zeros(self.state.shape, dtype=bool)
+        region[games, rows, cols] = True
+        empty = (self.counts == 0) & (self.mines != minesweeper.mine)
+        flood = games[empty[games, rows, cols]]
+        if flood.size:
+            grown = region[flood]
+            zero = empty[flood]
+            closed = self.state[flood] == minesweeper.unopened
+            while True:
+                ring = (minesweeper.neighbour_sum(grown & zero) > 0) & closed & ~grown
+                if not ring.any():
+                    break
+                grown |= ring
+            region[flood] = grown
+
+        opened = region & (self.state == minesweeper.unopened)
+        self.state[region] = self.counts[region]
+        is_mine = self.mines == minesweeper.mine
+        self.mine_hit |= (opened & is_mine).any(axis=(1, 2))
+        self.opened_empty += (opened & ~is_mine).sum(axis=(1, 2))
+        return opened
+
+    """flag the tile (rows[i], cols[i]) of every selected game if it is unopened, or unflag
+    it if it is flagged."""
+
+    def flag(self, rows, cols, mask=None):
+        games = self.select(mask)
+        rows = np.asarray(rows)[games]
+        cols = np.asarray(cols)[games]
+        tiles = self.state[games, rows, cols]
+        self.state[games, rows, cols] = np.where(
+            tiles == minesweeper.unopened,
+            minesweeper.flaged,
+            np.where(tiles == minesweeper.flaged, minesweeper.unopened, tiles),
+        )
+
+    def lost(self):
+        return self.mine_hit.copy()
+
+    def won(self):
+        empty_tiles = self.size * self.size - self.bomb_count
+        return ~self.mine_hit & (self.opened_empty == empty_tiles)
+
+    def done(self):
+        return self.lost() | self.won()
@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+
+import corpus
+import heuristic_model
+import minesweeper
+
+# a benchmark regresses when its median latency grows by more than this fraction
+default_threshold = 0.2
+
+"""records the mines and a copy of the board state after every move of a game, so the
+solvers can be timed on the positions they actually meet."""
+
+
+class SnapshotObserver(minesweeper.GameObserver):
+    def __init__(self):
+        self.states = []
+
+    def on_move(self, game, opp, r, c, source):
+        self.states.append((game.mines, game.state.copy()))
+
+
+"""output the amount of calls, the median and mean latency in microseconds and the
+throughput in calls per second of a list of [latencies] in seconds."""
+
+
+def summarize(latencies):
+    latencies = np.array(latencies) * 1e6
+    return {
+        "calls": len(latencies),
+        "median_us": float(np.median(latencies)),
+        "mean_us": float(latencies.mean()),
+        "throughput": float(len(latencies) / latencies.sum() * 1e6),
+    }
+
+
+"""time [fn] once for each tuple of arguments in [calls] and output the summary of the
+latencies. [setup] is called before each call, outside of the timed region, and its result
+is prepended to the arguments."""
+
+
+def time_calls(fn, calls, setup=None):
+    latencies = []
+    for args in calls:
+        if setup is not None:
+            args = setup(*args)
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+"""play every board of a [boards] corpus with a SolverSession as game_loop does, timing the
+work done on every move: SolverSession.next_move with the constraint store kept up to date
+with the changed tiles, Game.open, and the Game.won and Game.lost checks. Output the
+latencies of each, keyed by benchmark name."""
+
+
+def time_moves(boards, seed):
+    size = boards["mines"].shape[1]
+    bomb_count = boards["bomb_count"]
+    latencies = {"next_move": [], "game_open": [], "game_status": []}
+    for i, (r, c) in enumerate(boards["first_clicks"]):
+        game = minesweeper.Game(size, bomb_count, boards["mines"][i])
+        session = heuristic_model.SolverSession(np.random.default_rng([seed, i]))
+        game.open(int(r), int(c))
+        changed = None
+        while True:
+            start = time.perf_counter()
+            done = game.won() or game.lost()
+            latencies["game_status"].append(time.perf_counter() - start)
+            if done:
+                break
+            start = time.perf_counter()
+            opp, r, c = session.next_move(game.state, False, bomb_count, 1, 1, changed)
+            latencies["next_move"].append(time.perf_counter() - start)
+            if opp == "open":
+                start = time.perf_counter()
+                changed = game.open(r, c)
+                latencies["game_open"].append(time.perf_counter() - start)
+            else:
+                changed = game.flag(r, c)
+    return latencies
+
+
+"""play every board of a [boards] corpus once with the ai and output a (mines, board state)
+pair for every position met during the games."""
+
+
+def collect_positions(boards, seed):
+    observer = SnapshotObserver()
+    for i, (r, c) in enumerate(boards["first_clicks"]):
+        minesweeper.game_loop(
+            "ai",
+            boards["bomb_count"],
+            boards["mines"].shape[1],
+            1,
+            1,
+            observer,
+            seed=[seed, i],
+            mines=boards["mines"][i],
+            first_click=(int(r), int(c)),
+        )
+    return observer.states
+
+
+"""run every benchmark on a corpus of boards of each of the [difficulties] and output the
+results keyed by benchmark name. The boards are loaded from [corpus_dir]/[difficulty].npz,
+as saved by corpus.py, or if no directory is given [count] boards are generated from [seed].
+Generated boards may change with the numpy version, so baselines meant to be compared
+across environments should use a saved corpus."""
+
+
+def run(difficulties, count, seed=0, corpus_dir=None):
+    results = {}
+    for difficulty in difficulties:
+        if corpus_dir is None:
+            boards = corpus.generate_corpus(difficulty, count, seed)
+        else:
+            boards = corpus.load_corpus(os.path.join(corpus_dir, difficulty + ".npz"))
+        size, bomb_count = corpus.difficulties[difficulty]
+        states = collect_positions(boards, seed)
+        mines = boards["mines"]
+        counts = [minesweeper.neighbour_counts(board) for board in mines]
+
+        def fresh_board(i, r, c):
+            return minesweeper.init_board_state(size), mines[i], r, c, None, counts[i]
+
+        clicks = [
+            (i, int(r), int(c)) for i, (r, c) in enumerate(boards["first_clicks"])
+        ]
+        results[difficulty + "/open_tile"] = time_calls(
+            minesweeper.open_tile, clicks, fresh_board
+        )
+        for name, latencies in time_moves(boards, seed).items():
+            results[difficulty + "/" + name] = summarize(latencies)
+
+        results[difficulty + "/game_lost"] = time_calls(minesweeper.game_lost, states)
+        states = [state for _, state in states]
+        state_calls = [(state,) for state in states]
+        results[difficulty + "/game_won"] = time_calls(
+            minesweeper.game_won, [(state, bomb_count) for state in states]
+        )
+        results[difficulty + "/to_matrix"] = time_calls(
+            heuristic_model.to_matrix, state_calls
+        )
+        results[difficulty + "/SP_solver"] = time_calls(
+            heuristic_model.SP_solver, state_calls
+        )
+        results[difficulty + "/CSP_solver"] = time_calls(
+            heuristic_model.CSP_solver, state_calls
+        )
+        results[difficulty + "/local_probability"] = time_calls(
+            heuristic_model.select_tile_with_lowest_local_probability,
+            [(state, bomb_count) for state in states],
+        )
+
+        start = time.perf_counter()
+        games = corpus.play_corpus(boards, 1, 1, seed)
+        elapsed = time.perf_counter() - start
+        results[difficulty + "/game"] = {
+            "calls": len(games),
+            "median_us": float(np.median(np.diff(games["times"], prepend=0)) * 1e6),
+            "mean_us": elapsed / len(games) * 1e6,
+            "throughput": len(games) / elapsed,
+            "win_rate": float(games["wins"].mean()),
+        }
+    return results
+
+
+"""compare [results] with the [baseline] results and output a list of (name, baseline
+median, median) for every benchmark whose median latency grew by more than [threshold].
+Benchmarks missing from either side are ignored."""
+
+
+def find_regressions(results, baseline, threshold=default_threshold):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["median_us"]
+        after = result["median_us"]
+        if after > before * (1 + threshold):
+            regressions.append((name, before, after))
+    return regressions
+
+
+"""time the engine and solver hot paths, write the results as json and fail if any of them
+regressed compared to a stored baseline."""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="time the engine and solver hot paths on a fixed corpus of boards"
+    )
+    parser.add_argument(
+        "--difficulty",
+        action="append",
+        choices=list(corpus.difficulties),
+        help="difficulty to benchmark, may be repeated (default: all)",
+    )
+    parser.add_argument(
+        "--corpus",
+        help="directory of the corpus files saved by corpus.py (default: generate boards)",
+    )
+    parser.add_argument(
+        "--count", type=int, default=20, help="boards per difficulty to generate"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the generated boards and the ai"
+    )
+    parser.add_argument("--output", help="file to write the json results to")
+    parser.add_argument("--baseline", help="json results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=default_threshold,
+        help="allowed growth of the median latency before failing",
+    )
+    args = parser.parse_args()
+
+    difficulties = args.difficulty or list(corpus.difficulties)
+    results = run(difficulties, args.count, args.seed, args.corpus)
+    report = {
+        "meta": {
+            "corpus": args.corpus,
+            "count": args.count,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    for name, result in results.items():
+        print(
+            f"{name:32} {result['median_us']:12.1f} us {result['throughput']:12.1f} /s"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = find_regressions(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"regression in {name}: {before:.1f} us -> {after:.1f} us")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
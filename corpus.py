@@ -0,0 +1,101 @@
+import argparse
+import time
+import numpy as np
+
+import minesweeper
+
+# board size and mine count of each difficulty
+difficulties = {
+    "beginner": (9, 10),
+    "intermediate": (16, 40),
+    "expert": (22, 99),
+}
+
+"""generate a fixed corpus of [count] boards of a [difficulty], all drawn from a single
+np.random.Generator seeded with [seed]. Each board has a first click, chosen uniformly, that
+is never a mine. Output a dictionary with the (count, size, size) uint8 mines, the (count, 2)
+first clicks, the bomb count and the seed."""
+
+
+def generate_corpus(difficulty, count, seed=0):
+    size, bomb_count = difficulties[difficulty]
+    rng = np.random.default_rng(seed)
+    first_clicks = rng.integers(0, size, (count, 2))
+    mines = np.zeros((count, size, size), dtype=np.uint8)
+    for i, (r, c) in enumerate(first_clicks):
+        mines[i] = minesweeper.init_board(size, bomb_count, r, c, rng=rng)
+    return {
+        "mines": mines,
+        "first_clicks": first_clicks,
+        "bomb_count": bomb_count,
+        "seed": seed,
+    }
+
+
+"""save a corpus to a compressed .npz file at [path]."""
+
+
+def save_corpus(path, corpus):
+    np.savez_compressed(path, **corpus)
+
+
+"""load a corpus saved by save_corpus."""
+
+
+def load_corpus(path):
+    with np.load(path) as data:
+        return {
+            "mines": data["mines"],
+            "first_clicks": data["first_clicks"],
+            "bomb_count": int(data["bomb_count"]),
+            "seed": int(data["seed"]),
+        }
+
+
+"""play every board of a [corpus] with the ai, starting from its first click. The guesses of
+game i are seeded with [seed] and i, so two runs of the same solver are identical and two
+solvers always play the same boards. Output the same record array as generate_data."""
+
+
+def play_corpus(
+    corpus, certain_move_model, uncertain_move_strat, seed=0, observer=None
+):
+    mines = corpus["mines"]
+    size = mines.shape[1]
+    results = []
+    start_time = time.time()
+    for i, first_click in enumerate(corpus["first_clicks"]):
+        is_win, move_count = minesweeper.game_loop(
+            "ai",
+            corpus["bomb_count"],
+            size,
+            certain_move_model,
+            uncertain_move_strat,
+            observer,
+            seed=[seed, i],
+            mines=mines[i],
+            first_click=tuple(first_click),
+        )
+        results.append((int(is_win), time.time() - start_time, move_count))
+    return np.array(results, dtype=minesweeper.data_dtype)
+
+
+"""generate the benchmark corpus of every difficulty and save it as
+[directory]/[difficulty].npz."""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="generate the benchmark corpus of every difficulty"
+    )
+    parser.add_argument("directory", help="directory to save the corpus files in")
+    parser.add_argument("--count", type=int, default=1000, help="boards per difficulty")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the corpus")
+    args = parser.parse_args()
+    for difficulty in difficulties:
+        corpus = generate_corpus(difficulty, args.count, args.seed)
+        save_corpus(args.directory + "/" + difficulty + ".npz", corpus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+from fractions import Fraction
+import math
+import time
+import numpy as np
+
+# board state constants, mirrored from minesweeper
+unopened = -1
+flaged = -2
+
+# the change in tile for each of the 8 surrounding tiles
+coordinates = {(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)}
+
+"""Given a grid, or a stack of grids along the leading axes, output for every tile the sum
+of the grid over its eight neighbour tiles, treating tiles outside the board as 0."""
+
+
+def neighbour_sum(grid):
+    grid = np.asarray(grid, dtype=np.int64)
+    rows, cols = grid.shape[-2:]
+    padded = np.zeros(grid.shape[:-2] + (rows + 2, cols + 2), dtype=np.int64)
+    padded[..., 1:-1, 1:-1] = grid
+    # sum over the 3 x 3 box as a sum over 3 rows followed by a sum over 3 columns
+    box = padded[..., :-2, :] + padded[..., 1:-1, :] + padded[..., 2:, :]
+    box = box[..., :-2] + box[..., 1:-1] + box[..., 2:]
+    return box - grid
+
+
+"""Given a board_state, or a stack of board states along the leading axes, apply the single
+point rule to every opened tile at once. The unopened and flagged neighbours of every tile
+are counted with neighbour sums; a tile whose unopened neighbours are all mines marks them
+as mines, and a tile whose mines are all flagged marks its unopened neighbours as safe.
+Output the (mines, safe) boolean masks of the unopened tiles."""
+
+
+def single_point_masks(board_state):
+    board_state = np.asarray(board_state)
+    unopened_tiles = board_state == unopened
+    unopened_count = neighbour_sum(unopened_tiles)
+    remaining = board_state - neighbour_sum(board_state == flaged)
+    frontier = (board_state > 0) & (unopened_count > 0)
+    all_mines = frontier & (remaining == unopened_count)
+    all_safe = frontier & (remaining == 0)
+    mines = (neighbour_sum(all_mines) > 0) & unopened_tiles
+    safe = (neighbour_sum(all_safe) > 0) & unopened_tiles
+    return mines, safe
+
+
+"""Given a board_state and an opened tile (r, c), return the constraint of that tile
+as a (cells, mines) pair. cells is a tuple of the unopened neighbours in row-major
+order and mines is the surrounding mine count minus the flagged neighbours."""
+
+
+def tile_constraint(board_state, r, c):
+    row_size = len(board_state)
+    col_size = len(board_state[0])
+    cells = []
+    mines = int(board_state[r][c])
+    for i, j in sorted(coordinates):
+        if 0 <= r + i < row_size and 0 <= c + j < col_size:
+            if board_state[r + i][c + j] == unopened:
+                cells.append((r + i, c + j))
+            elif board_state[r + i][c + j] == flaged:
+                mines -= 1
+    return tuple(cells), mines
+
+
+"""Given a board_state, build the sparse constraint system of the frontier. Only
+opened tiles with a positive mine count that border an unopened tile become rows,
+so only frontier tiles ever appear as columns. Rows are returned in row-major
+order of the opened tile as (cells, mines) pairs."""
+
+
+def frontier_constraints(board_state):
+    constraints = []
+    for r, c in np.argwhere(np.asarray(board_state) > 0):
+        cells, mines = tile_constraint(board_state, r, c)
+        if cells:
+            constraints.append((cells, mines))
+    return constraints
+
+
+"""Row reduce a list of (cells, mines) constraints with exact fraction arithmetic.
+Each row is stored sparsely as a dictionary from cell to its non-zero coefficient,
+and columns are eliminated in row-major order of the cells. Returns the reduced
+rows as (coefficients, rhs) pairs, dropping rows that reduced to 0 = 0."""
+
+
+def reduce_constraints(constraints):
+    rows = [
+        ({cell: Fraction(1) for cell in cells}, Fraction(mines))
+        for cells, mines in constraints
+    ]
+    columns = sorted({cell for cells, _ in constraints for cell in cells})
+    pivot = 0
+    for col in columns:
+        for i in range(pivot, len(rows)):
+            if col in rows[i][0]:
+                break
+        else:
+            continue
+        rows[pivot], rows[i] = rows[i], rows[pivot]
+        coeffs, rhs = rows[pivot]
+        scale = coeffs[col]
+        if scale != 1:
+            coeffs = {cell: value / scale for cell, value in coeffs.items()}
+            rhs = rhs / scale
+            rows[pivot] = (coeffs, rhs)
+        for i in range(len(rows)):
+            if i == pivot or col not in rows[i][0]:
+                continue
+            factor = rows[i][0][col]
+            reduced = dict(rows[i][0])
+            for cell, value in coeffs.items():
+                value = reduced.get(cell, 0) - factor * value
+                if value:
+                    reduced[cell] = value
+                else:
+                    reduced.pop(cell, None)
+            rows[i] = (reduced, rows[i][1] - factor * rhs)
+        pivot += 1
+    return [(coeffs, rhs) for coeffs, rhs in rows if coeffs]
+
+
+"""Analyze a single sparse row to see if any certain moves can be made. If the rhs is
+equal to the maximum of the row, positive cells are mines and negative cells are empty.
+If it is equal to the minimum, positive cells are empty and negative cells are mines.
+Returns a list of (opp, r, c) moves in row-major order of the cells."""
+
+
+def analyze_row(coeffs, rhs):
+    maximum = sum(value for value in coeffs.values() if value > 0)
+    minimum = sum(value for value in coeffs.values() if value < 0)
+    if maximum == rhs:
+        positive, negative = "flag", "open"
+    elif minimum == rhs:
+        positive, negative = "open", "flag"
+    else:
+        return []
+    moves = []
+    for (r, c), value in sorted(coeffs.items()):
+        moves.append((positive if value > 0 else negative, r, c))
+    return moves
+
+
+"""Given a list of (cells, mines) constraints, output every certain move as a list of
+(opp, r, c) triples. The original rows are analyzed first, followed by the rows of
+the reduced system, so every single point deduction is kept and the elimination only
+adds to it. Duplicate moves are dropped."""
+
+
+def certain_moves(constraints):
+    moves = []
+    seen = set()
+    rows = [({cell: 1 for cell in cells}, mines) for cells, mines in constraints]
+    for coeffs, rhs in rows + reduce_constraints(constraints):
+        for move in analyze_row(coeffs, rhs):
+            if move not in seen:
+                seen.add(move)
+                moves.append(move)
+    return moves
+
+
+"""A persistent store of the frontier constraints of a single game. The store is
+built once from a board_state and afterwards only receives the tiles changed by
+open_tile or flag_tile, so only the constraints of those tiles and their
+neighbours are recomputed. constraints maps each opened tile on the frontier to
+its (cells, mines) pair, cell_constraints maps each unopened frontier tile to the
+opened tiles that constrain it, and dirty holds the tiles whose constraint has
+changed since the solvers last looked at it. Two constraints belong to the same
+component when they share an unopened tile, and the moves of every solved
+component are cached in solutions so an unchanged component is never solved
+twice. The mine assignments counted for a component are cached the same way in
+enumerations."""
+
+
+class ConstraintStore(object):
+    def __init__(self):
+        self.constraints = {}
+        self.cell_constraints = {}
+        self.dirty = set()
+        self.solutions = {}
+        self.enumerations = {}
+        self.row_size = 0
+        self.col_size = 0
+
+    def rebuild(self, board_state):
+        self.constraints.clear()
+        self.cell_constraints.clear()
+        self.dirty.clear()
+        self.solutions.clear()
+        self.enumerations.clear()
+        self.row_size = len(board_state)
+        self.col_size = len(board_state[0])
+        for r, c in np.argwhere(np.asarray(board_state) > 0):
+            self.update_tile(board_state, int(r), int(c))
+
+    def update(self, board_state, changed):
+        tiles = set()
+        for r, c in changed:
+            tiles.add((r, c))
+            for i, j in coordinates:
+                if 0 <= r + i < self.row_size and 0 <= c + j < self.col_size:
+                    tiles.add((r + i, c + j))
+        for r, c in tiles:
+            self.update_tile(board_state, r, c)
+
+    def update_tile(self, board_state, r, c):
+        tile = (r, c)
+        constraint = None
+        if board_state[r][c] > 0:
+            constraint = tile_constraint(board_state, r, c)
+            if not constraint[0]:
+                constraint = None
+        old = self.constraints.get(tile)
+        if old == constraint:
+            return
+        if old is not None:
+            for cell in old[0]:
+                tiles = self.cell_constraints[cell]
+                tiles.discard(tile)
+                if not tiles:
+                    del self.cell_constraints[cell]
+            del self.constraints[tile]
+        if constraint is not None:
+            for cell in constraint[0]:
+                self.cell_constraints.setdefault(cell, set()).add(tile)
+            self.constraints[tile] = constraint
+        self.dirty.add(tile)
+
+    def take_dirty(self):
+        dirty = sorted(tile for tile in self.dirty if tile in self.constraints)
+        self.dirty.clear()
+        return [self.constraints[tile] for tile in dirty]
+
+    def frontier(self):
+        return self.cell_constraints.keys()
+
+    def components(self, tiles=None):
+        if tiles is None:
+            tiles = self.constraints
+        seen = set()
+        components = []
+        for tile in sorted(tiles):
+            if tile in seen or tile not in self.constraints:
+                continue
+            seen.add(tile)
+            component = []
+            stack = [tile]
+            while stack:
+                current = stack.pop()
+                component.append(current)
+                for cell in self.constraints[current][0]:
+                    for other in self.cell_constraints[cell]:
+                        if other not in seen:
+                            seen.add(other)
+                            stack.append(other)
+            components.append([self.constraints[t] for t in sorted(component)])
+        return components
+
+    def take_dirty_components(self):
+        components = self.components(self.dirty)
+        self.dirty.clear()
+        return components
+
+    def certain_moves(self, component):
+        key = tuple(component)
+        if key not in self.solutions:
+            self.solutions[key] = certain_moves(component)
+        return self.solutions[key]
+
+    def enumerate(self, component, deadline=None):
+        key = tuple(component)
+        if key not in self.enumerations:
+            self.enumerations[key] = enumerate_component(component, deadline)
+        return self.enumerations[key]
+
+
+# raised when an enumeration runs past its deadline
+class BudgetExceeded(Exception):
+    pass
+
+
+"""Given the constraints of a component, count every valid mine assignment of its
+cells with backtracking. A branch is pruned as soon as a constraint needs more
+mines than it has unassigned cells left, or fewer than zero. Returns the cells of
+the component and a dictionary mapping each total mine count k to a pair of the
+amount of assignments with k mines and, for every cell, the amount of those
+assignments in which the cell is a mine. Raises BudgetExceeded once [deadline],
+a time.perf_counter value, has passed."""
+
+
+def enumerate_component(component, deadline=None):
+    index = {}
+    cells = []
+    for constraint_cells, _ in component:
+        for cell in constraint_cells:
+            if cell not in index:
+                index[cell] = len(cells)
+                cells.append(cell)
+    cell_rows = [[] for _ in cells]
+    for row, (constraint_cells, _) in enumerate(component):
+        for cell in constraint_cells:
+            cell_rows[index[cell]].append(row)
+    remaining = [mines for _, mines in component]
+    unassigned = [len(constraint_cells) for constraint_cells, _ in component]
+    assignment = [0] * len(cells)
+    totals = {}
+    nodes = [0]
+
+    def search(i, k):
+        nodes[0] += 1
+        if deadline is not None and nodes[0] % 256 == 0:
+            if time.perf_counter() > deadline:
+                raise BudgetExceeded()
+        if i == len(cells):
+            count, cell_counts = totals.setdefault(k, [0, [0] * len(cells)])
+            totals[k][0] = count + 1
+            for j, value in enumerate(assignment):
+                cell_counts[j] += value
+            return
+        rows = cell_rows[i]
+        for value in (0, 1):
+            for row in rows:
+                unassigned[row] -= 1
+                remaining[row] -= value
+            if all(0 <= remaining[row] <= unassigned[row] for row in rows):
+                assignment[i] = value
+                search(i + 1, k + value)
+            for row in rows:
+                unassigned[row] += 1
+                remaining[row] += value
+        assignment[i] = 0
+
+    if all(0 <= remaining[row] <= unassigned[row] for row in range(len(component))):
+        search(0, 0)
+    return cells, {
+        k: (count, cell_counts) for k, (count, cell_counts) in totals.items()
+    }
+
+
+"""Multiply two polynomials given as dictionaries from exponent to coefficient."""
+
+
+def convolve(a, b):
+    result = {}
+    for i, x in a.items():
+        for j, y in b.items():
+            result[i + j] = result.get(i + j, 0) + x * y
+    return result
+
+
+"""Given a board_state, the total [bomb_count] and a constraint [store] kept up to
+date with the game, output the exact probability of every unopened tile being a
+mine, with opened and flagged tiles set to 2. Every frontier component is
+enumerated on its own. The components are then combined by weighting each total
+frontier mine count K with C(U, M - K), the amount of ways to place the remaining
+mines in the U unconstrained tiles, where M is the bomb_count minus the flags.
+Returns None if a component has more than [max_component_cells] cells or the
+enumeration takes longer than [time_budget] seconds."""
+
+
+def mine_probabilities(
+    board_state, bomb_count, store, max_component_cells=48, time_budget=None
+):
+    model = probability_model(
+        board_state, bomb_count, store, max_component_cells, time_budget
+    )
+    if model is None:
+        return None
+    return model[0]
+
+
+"""The computation of mine_probabilities, which also outputs for every component a
+(component, weights) pair. weights maps each mine count k of the component to the
+amount of ways, up to a common factor, to place the other mines of the board when the
+component holds k mines, so that enumerations of the same component under extra
+constraints can be weighted the same way. Output None or (probabilities, components)."""
+
+
+def probability_model(
+    board_state, bomb_count, store, max_component_cells=48, time_budget=None
+):
+    deadline = None
+    if time_budget is not None:
+        deadline = time.perf_counter() + time_budget
+    enumerations = []
+    components = store.components()
+    for component in components:
+        if (
+            len({cell for cells, _ in component for cell in cells})
+            > max_component_cells
+        ):
+            return None
+        try:
+            enumerations.append(store.enumerate(component, deadline))
+        except BudgetExceeded:
+            return None
+
+    board_state = np.asarray(board_state)
+    unconstrained = int(np.count_nonzero(board_state == unopened)) - len(
+        store.frontier()
+    )
+    mines_left = int(bomb_count) - int(np.count_nonzero(board_state == flaged))
+
+    def weight(k):
+        if k < 0 or k > mines_left or mines_left - k > unconstrained:
+            return 0
+        return math.comb(unconstrained, mines_left - k)
+
+    polys = [
+        {k: count for k, (count, _) in totals.items()} for _, totals in enumerations
+    ]
+    prefix = [{0: 1}]
+    for poly in polys:
+        prefix.append(convolve(prefix[-1], poly))
+    suffix = [{0: 1}]
+    for poly in reversed(polys):
+        suffix.append(convolve(suffix[-1], poly))
+    suffix.reverse()
+
+    total = sum(count * weight(k) for k, count in prefix[-1].items())
+    if total == 0:
+        return None
+
+    probabilities = np.full(board_state.shape, 2.0)
+    if unconstrained > 0:
+        expected = sum(
+            count * weight(k) * (mines_left - k) for k, count in prefix[-1].items()
+        )
+        probabilities[board_state == unopened] = expected / (total * unconstrained)
+    weighted_components = []
+    for i, (cells, totals) in enumerate(enumerations):
+        others = convolve(prefix[i], suffix[i + 1])
+        weights = {
+            k: sum(count * weight(k + j) for j, count in others.items())
+            for k in range(len(cells) + 1)
+        }
+        mine_counts = [0] * len(cells)
+        for k, (_, cell_counts) in totals.items():
+            for j, cell_count in enumerate(cell_counts):
+                mine_counts[j] += cell_count * weights[k]
+        for (r, c), mine_count in zip(cells, mine_counts):
+            probabilities[r][c] = mine_count / total
+        weighted_components.append((components[i], weights))
+    return probabilities, weighted_components
@@ -0,0 +1,171 @@
+import argparse
+import os
+import numpy as np
+
+import minesweeper
+
+# every record file starts with a magic string and a format version
+magic = b"MSGR"
+version = 1
+
+# the fixed size header of each game record, followed by the packed mine bitmap of the board
+# and move_count moves
+record_dtype = np.dtype(
+    [
+        ("rows", "<u2"),
+        ("cols", "<u2"),
+        ("bomb_count", "<u4"),
+        ("first_r", "<u2"),
+        ("first_c", "<u2"),
+        ("won", "u1"),
+        ("move_count", "<u4"),
+    ]
+)
+move_dtype = np.dtype([("op", "u1"), ("r", "<u2"), ("c", "<u2")])
+
+# the operation codes of the move stream
+ops = {"open": 0, "flag": 1, "chord": 2}
+
+"""streams every game played by game_loop to a record file as soon as it ends. The moves of
+the current game are kept in memory until then. New records are appended to an existing
+file."""
+
+
+class GameRecordWriter(minesweeper.GameObserver):
+    def __init__(self, path):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if new_file:
+            self.file.write(magic + bytes([version]))
+        self.moves = []
+
+    def on_move(self, game, opp, r, c, source):
+        # moves the game did not carry out, such as mistyped human input, are not recorded
+        if opp in ops:
+            self.moves.append((ops[opp], r, c))
+
+    def on_end(self, game, won, move_count):
+        self.write(game.mines, self.moves, won)
+        self.moves = []
+
+    def write(self, mines, moves, won):
+        first_r, first_c = next(((r, c) for op, r, c in moves if op == 0), (0, 0))
+        header = np.zeros(1, dtype=record_dtype)
+        header["rows"], header["cols"] = mines.shape
+        header["bomb_count"] = np.count_nonzero(mines == minesweeper.mine)
+        header["first_r"], header["first_c"] = first_r, first_c
+        header["won"] = won
+        header["move_count"] = len(moves)
+        self.file.write(header.tobytes())
+        self.file.write(np.packbits(mines == minesweeper.mine).tobytes())
+        self.file.write(np.array(moves, dtype=move_dtype).tobytes())
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+"""a single game read from a record file. mines and moves are views into the memory-mapped
+file, so nothing is copied until they are used."""
+
+
+class GameRecord(object):
+    def __init__(self, header, bitmap, moves):
+        self.rows = int(header["rows"])
+        self.cols = int(header["cols"])
+        self.bomb_count = int(header["bomb_count"])
+        self.first_move = (int(header["first_r"]), int(header["first_c"]))
+        self.won = bool(header["won"])
+        self.bitmap = bitmap
+        self.moves = moves
+
+    def mines(self):
+        bits = np.unpackbits(self.bitmap, count=self.rows * self.cols)
+        return bits.reshape(self.rows, self.cols)
+
+    """replay the first [step] moves of the game, or every move if not given, and output
+    the board state the user could see at that point."""
+
+    def board_state_at(self, step=None):
+        game = minesweeper.Game(self.rows, self.bomb_count, self.mines())
+        for op, r, c in self.moves[:step].tolist():
+            if op == ops["open"]:
+                game.open(r, c)
+            elif op == ops["flag"]:
+                game.flag(r, c)
+            else:
+                game.chord(r, c)
+        return game.state
+
+
+"""reads a record file through a memory map, so records can be scanned or replayed without
+loading the whole file. Only the record headers are read to index the file."""
+
+
+class GameRecordReader(object):
+    def __init__(self, path):
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if len(self.data) <= len(magic) or bytes(self.data[: len(magic)]) != magic:
+            raise ValueError(path + " is not a game record file")
+        if self.data[len(magic)] != version:
+            raise ValueError(
+                path
+                + " has format version "
+                + str(self.data[len(magic)])
+                + ", expected "
+                + str(version)
+            )
+        self.offsets = []
+        offset = len(magic) + 1
+        while offset < len(self.data):
+            self.offsets.append(offset)
+            header = self.header(offset)
+            tiles = int(header["rows"]) * int(header["cols"])
+            offset += record_dtype.itemsize + (tiles + 7) // 8
+            offset += int(header["move_count"]) * move_dtype.itemsize
+
+    def header(self, offset):
+        return self.data[offset : offset + record_dtype.itemsize].view(record_dtype)[0]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        offset = self.offsets[index]
+        header = self.header(offset)
+        offset += record_dtype.itemsize
+        tiles = int(header["rows"]) * int(header["cols"])
+        bitmap = self.data[offset : offset + (tiles + 7) // 8]
+        offset += (tiles + 7) // 8
+        move_bytes = int(header["move_count"]) * move_dtype.itemsize
+        moves = self.data[offset : offset + move_bytes].view(move_dtype)
+        return GameRecord(header, bitmap, moves)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+"""print the board state of a recorded game after a given amount of moves."""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="print the board state of a recorded game after a given amount of moves"
+    )
+    parser.add_argument("path", help="game record file")
+    parser.add_argument("index", type=int, help="index of the game in the file")
+    parser.add_argument("step", type=int, nargs="?", help="amount of moves to replay")
+    args = parser.parse_args()
+    record = GameRecordReader(args.path)[args.index]
+    minesweeper.print_board(record.mines(), record.board_state_at(args.step))
+
+
+if __name__ == "__main__":
+    main()
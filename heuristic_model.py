@@ -1,14 +1,19 @@
-from sympy import *
 import numpy as np
 from collections import deque
+import csp
+from solver_stats import clock
 
-# represents the knowledge base of the AI, so that moves are not duplicated
-mines = set()
-empty = set()
+# the budget of the exact probability strategy, beyond which it falls back to local probability
+exact_max_component_cells = 48
+exact_time_budget = 0.05
 
-# store moves as a tripple - (opp, r, c) - where opp is "flag" or "mine" and
-# and r and c represent coordinates row and columns respectively
-queue = deque()
+# the lookahead strategy weighs the safety of a guess against the chance that it reveals a 0,
+# among the guesses at most lookahead_probability_margin riskier than the safest one, and
+# spends at most lookahead_time_budget seconds per guess
+lookahead_weight = 1.0
+lookahead_probability_margin = 0.02
+lookahead_max_candidates = 16
+lookahead_time_budget = 0.1
 
 # the change in tile for each of the 8 surrounding tiles
 
@@ -58,146 +63,136 @@ by seeing if the final column index is equal to the maximum or minimum of this e
 If it is equal to the maximum, positive tiles are mines and negative tiles are empty.
 If it is equal to the minimum, postive tiles are empty and negative tiles are mines.
 The given information should be added to queue, which represents certain moves. Additionally, 
-the AI knowledge base (the sets mines and empty) should be updated."""
+the AI knowledge base (the sets mines and empty) should be updated. Both belong to the solver
+[session], and the queue is output. The sums and matches of all rows are computed at once
+with numpy, and rows without a coefficient are skipped."""
 
 
-def analyze_matrix(board_rep, board_state):
+def analyze_matrix(board_rep, board_state, session=None):
+    if session is None:
+        session = SolverSession()
     tile_count = len(board_state) * len(board_state[0])
-    for r in range(tile_count):
-        maximum = 0
-        minimum = 0
-        for c in range(tile_count):
-            if board_rep[r, c] > 0:
-                maximum += board_rep[r, c]
-            else:
-                minimum += board_rep[r, c]
-        if maximum == board_rep[r, tile_count]:
-            for c in range(tile_count):
-                i, j = c // len(board_state), c % len(board_state)
-                if board_rep[r, c] > 0:
-                    if (i, j) not in mines:
-                        queue.append(("flag", i, j))
-                        mines.add((i, j))
-                elif board_rep[r, c] < 0:
-                    if (i, j) not in empty:
-                        queue.append(("open", i, j))
-                        empty.add((i, j))
-        elif minimum == board_rep[r, tile_count]:
-            for c in range(tile_count):
-                i, j = c // len(board_state), c % len(board_state)
-                if board_rep[r, c] > 0:
-                    if (i, j) not in empty:
-                        queue.append(("open", i, j))
-                        empty.add((i, j))
-                elif board_rep[r, c] < 0 and (i, j) not in mines:
-                    queue.append(("flag", i, j))
-                    mines.add((i, j))
-
-
-"""Given a board_state, run the CSP solver"""
-
-
-def CSP_solver(board_state):
-    # create a matrix representation of the board_state
-    board_rep = to_matrix(board_state)
-
-    # row reduce the board representation
-    board_rep = Matrix(board_rep)
-    board_rep.rref()
-
-    # determine flag and move operations from the row reduced board representation
-    analyze_matrix(board_rep, board_state)
+    matrix = np.asarray(board_rep)
+    coeffs = matrix[:tile_count, :tile_count]
+    rhs = matrix[:tile_count, tile_count]
+    positive = np.asarray(coeffs > 0, dtype=bool)
+    negative = np.asarray(coeffs < 0, dtype=bool)
+
+    # rows without a coefficient can not give a move
+    rows = np.flatnonzero((positive | negative).any(axis=1))
+    coeffs, rhs = coeffs[rows], rhs[rows]
+    positive, negative = positive[rows], negative[rows]
+
+    maximum = np.where(positive, coeffs, 0).sum(axis=1)
+    minimum = np.where(negative, coeffs, 0).sum(axis=1)
+    at_maximum = np.asarray(maximum == rhs, dtype=bool)[:, None]
+    at_minimum = ~at_maximum & np.asarray(minimum == rhs, dtype=bool)[:, None]
+    flags = (positive & at_maximum) | (negative & at_minimum)
+    opens = (negative & at_maximum) | (positive & at_minimum)
+
+    # add the moves row by row, in column order
+    moves = []
+    for r, c in zip(*np.nonzero(flags | opens)):
+        i, j = int(c) // len(board_state), int(c) % len(board_state)
+        moves.append(("flag" if flags[r, c] else "open", i, j))
+    session.enqueue_moves(moves)
+    return session.queue
+
+
+"""Given a board_state, run the CSP solver. Only the frontier is turned into a
+linear system: one sparse row per opened number tile that borders an unopened
+tile, with one column per unopened frontier tile. The frontier is split into
+independent components, and each component is row reduced with exact fractions
+and every certain move is added to the queue of the solver [session], which is
+output. If the session is kept up to date with the game, only the components
+touched since the last call are solved again."""
+
+
+def CSP_solver(board_state, session=None):
+    if session is None:
+        session = SolverSession()
+        session.store.rebuild(board_state)
+    store = session.store
+    for component in store.take_dirty_components():
+        if session.stats is not None:
+            cells = {cell for cells, _ in component for cell in cells}
+            session.stats.observe("component_constraints", len(component))
+            session.stats.observe("component_cells", len(cells))
+        session.enqueue_moves(store.certain_moves(component))
+    return session.queue
 
 
 """Given a board_state, run the single point solver. This consists of checking
  whether given the surrounding mine count of a tile, can we reveals known mines 
  or bombs. We may flag tiles if the mine count == unopened tile count, and we
- may open tiles if the mine count == flagged count"""
+ may open tiles if the mine count == flagged count. The whole board is checked at
+ once with csp.single_point_masks, and the moves are added in row-major order to the
+ queue of the solver [session], which is output."""
 
 
-def SP_solver(board_state):
-    col_size = len(board_state[0])
-    row_size = len(board_state)
-    for r in range(row_size):
-        for c in range(col_size):
-            mine_count = board_state[r][c]
-            unopened_tiles = []
-            flaged_tiles = []
-            if mine_count > 0:
-                for i, j in coordinates:
-                    if (
-                        r + i >= 0
-                        and j + c >= 0
-                        and j + c < col_size
-                        and r + i < row_size
-                    ):
-                        if board_state[r + i][j + c] == -1:
-                            unopened_tiles.append((r + i, j + c))
-                        elif board_state[r + i][j + c] == -2:
-                            flaged_tiles.append((r + i, j + c))
-                if len(flaged_tiles) == mine_count:
-                    for x, y in unopened_tiles:
-                        if (x, y) not in empty:
-                            queue.append(("open", x, y))
-                            empty.add((x, y))
-                elif len(unopened_tiles) + len(flaged_tiles) == mine_count:
-                    for x, y in unopened_tiles:
-                        if (x, y) not in mines:
-                            queue.append(("flag", x, y))
-                            mines.add((x, y))
-
-
-"""Given a board_state, choose a random unopened tile """
-
-
-def random_move(board_state):
+def SP_solver(board_state, session=None):
+    if session is None:
+        session = SolverSession()
+    mines, safe = csp.single_point_masks(board_state)
+    session.enqueue_moves(
+        ("flag" if mines[r, c] else "open", r, c)
+        for r, c in np.argwhere(mines | safe).tolist()
+    )
+    return session.queue
+
+
+"""Output a random index below [count], drawn from the np.random.Generator [rng] or
+from the global np.random if not given."""
+
+
+def random_index(count, rng=None):
+    if rng is None:
+        return np.random.randint(0, count)
+    return rng.integers(0, count)
+
+
+"""Given a board_state, choose a random unopened tile and add it to the knowledge
+base of the solver [session] if given. [rng] is an optional np.random.Generator."""
+
+
+def random_move(board_state, session=None, rng=None):
     unopened = np.argwhere(board_state == -1)
-    index = np.random.choice(len(unopened))
+    index = (np.random if rng is None else rng).choice(len(unopened))
     r, c = unopened[index][0], unopened[index][1]
-    empty.add((r, c))
-    print("random!")
+    if session is not None:
+        session.empty.add((r, c))
     return ("open", r, c)
 
 
-"""Given a board_state and bomb_count, output the tile with the lowest local probability.
-If there is a conflict when assigning a local probability, assign the the highest probability
-to that tile """
+"""Given a board_state and bomb_count, output the map of the local probability of every tile
+being a mine, with 2 for opened and flagged tiles. Every number tile gives its unopened
+neighbours the ratio of its unflagged mines to its unopened neighbours. If there is a conflict
+when assigning a local probability, assign the highest probability to that tile; a tile still
+at 1, the value of an unassigned tile, takes the next ratio. The ratios of the neighbours of
+all tiles are applied at once for each of the 8 directions, in the row-major order of the
+number tiles. Tiles left at 1 form the unknown set, which shares the mines not expected in
+the frontier."""
 
 
-def select_tile_with_lowest_local_probability(board_state, bomb_count):
-    col_size = len(board_state[0])
-    row_size = len(board_state)
-    local_probabilites = np.ones_like(board_state).astype(float)
+def local_probability_map(board_state, bomb_count):
+    board_state = np.asarray(board_state)
+    row_size, col_size = board_state.shape
+    unopened_tiles = board_state == -1
+    unopened_count = csp.neighbour_sum(unopened_tiles)
+    mine_count = board_state - csp.neighbour_sum(board_state == -2)
+    frontier = (board_state > 0) & (mine_count > 0) & (unopened_count > 0)
+    ratios = np.full((row_size + 2, col_size + 2), np.nan)
+    ratios[1:-1, 1:-1][frontier] = mine_count[frontier] / unopened_count[frontier]
+
     # find the probability of all the mines in the frontier set
     # if there is a conflicting probability, assign the highest local probability
-    for r in range(row_size):
-        for c in range(col_size):
-            mine_count = board_state[r][c]
-            unopened_tiles = []
-            flaged_tiles = []
-            if mine_count != -1:
-                local_probabilites[r][c] = 2
-            if mine_count > 0:
-                for i, j in coordinates:
-                    if (
-                        r + i >= 0
-                        and j + c >= 0
-                        and j + c < col_size
-                        and r + i < row_size
-                    ):
-                        if board_state[r + i][j + c] == -1:
-                            unopened_tiles.append((r + i, j + c))
-                        elif board_state[r + i][j + c] == -2:
-                            flaged_tiles.append((r + i, j + c))
-                mine_count = mine_count - len(flaged_tiles)
-                if mine_count > 0:
-                    for x, y in unopened_tiles:
-                        lp = mine_count / len(unopened_tiles)
-                        if (
-                            local_probabilites[x][y] == 1
-                            or lp > local_probabilites[x][y]
-                        ):
-                            local_probabilites[x][y] = lp
+    local_probabilites = np.ones(board_state.shape)
+    for i, j in sorted(coordinates):
+        lp = ratios[1 + i : 1 + i + row_size, 1 + j : 1 + j + col_size]
+        assign = (local_probabilites == 1) | (lp > local_probabilites)
+        assign &= ~np.isnan(lp)
+        local_probabilites[assign] = lp[assign]
+    local_probabilites[~unopened_tiles] = 2
 
     # the amount of bombs in the unknown set
     unknown_set_count = np.sum(local_probabilites[local_probabilites == 1])
@@ -215,6 +210,16 @@ def select_tile_with_lowest_local_probability(board_state, bomb_count):
         # set all tiles in the unkown set to the same probability
         local_probabilites[local_probabilites == 1] = unexplored_probabilites
 
+    return local_probabilites
+
+
+"""Given a board_state and bomb_count, output the tile with the lowest local probability of
+local_probability_map. Ties are broken with the optional np.random.Generator [rng]."""
+
+
+def select_tile_with_lowest_local_probability(board_state, bomb_count, rng=None):
+    local_probabilites = local_probability_map(board_state, bomb_count)
+
     # find lowest probabiltiy
     lowest_probability = np.amin(local_probabilites)
 
@@ -222,47 +227,346 @@ def select_tile_with_lowest_local_probability(board_state, bomb_count):
     indices = np.argwhere(local_probabilites == lowest_probability)
 
     # find a random tile out of all of the lowest probability tiles
-    select = np.random.randint(0, len(indices))
+    select = random_index(len(indices), rng)
 
     return indices[select][0], indices[select][1]
 
 
-"""Given a board_state output an opp: open or flag, an a coordinate r, c to do such operation """
-
-# certain_move shows how we developed the AI's certain move strategy
-# 0 is the basic strategy where it makes a move based on information at a single point
-# 1 takes into account all the information we know and creates a constraint satisfaction problem
+"""Given a board_state and bomb_count, output the tile with the lowest exact probability
+of being a mine, computed by enumerating the mine assignments of every frontier component.
+If the enumeration is over budget, fall back to the tile with the lowest local probability.
+Ties are broken with the optional np.random.Generator [rng]."""
 
 
-# uncertain_move shows how we developed the AI's uncertain move strategy
-# 0 is the basic strategy where it makes a random move if there are no certain moves
-# 1 takes into account the locaal probability of each tile and returns the one with lowest chance of being a mine
-# 2 adds a distance heuristic
-def ai_heuristic_logic(
-    board_state, first_move, bomb_count, certain_move_model, uncertain_move_strat
+def select_tile_with_lowest_exact_probability(
+    board_state, bomb_count, store=None, rng=None
 ):
-    if first_move:
-        while queue:
-            queue.pop()
-        mines.clear()
-        empty.clear()
-
-    # If a move remains from last AI call, return move
-    if queue:
-        return queue.popleft()
-
-    if not certain_move_model:
-        SP_solver(board_state)
-    else:
-        CSP_solver(board_state)
+    if store is None:
+        store = csp.ConstraintStore()
+        store.rebuild(board_state)
+    probabilities = csp.mine_probabilities(
+        board_state,
+        bomb_count,
+        store,
+        exact_max_component_cells,
+        exact_time_budget,
+    )
+    if probabilities is None:
+        return select_tile_with_lowest_local_probability(board_state, bomb_count, rng)
+
+    # find all indices lowest probability and select a random one
+    indices = np.argwhere(probabilities == np.amin(probabilities))
+    select = random_index(len(indices), rng)
+
+    return indices[select][0], indices[select][1]
 
-    # If trivial move was found, make trivial move
-    if queue:
-        return queue.popleft()
 
-    # if no queue chose a random unopened tile
-    if not uncertain_move_strat:
-        return random_move(board_state)
+"""Given a board_state and bomb_count, output the guess that best combines a low probability
+of being a mine with a one-step lookahead: the chance that the tile reveals a 0, which makes
+all of its neighbours safe and opens them. The candidates are the tiles at most
+lookahead_probability_margin above the lowest probability, or only the safe tiles if there
+are any, and each is scored by (1 - p) * (1 + lookahead_weight * p0), where p0 is the chance
+that none of its neighbours is a mine given that the tile is safe. Every candidate is first
+scored with its neighbours taken as independent, and the lookahead_max_candidates best, with
+ties broken at random, are shortlisted. For a shortlisted candidate in a frontier component,
+the chance that its neighbours in the component are all safe given that it is safe is then
+found exactly by enumerating the component with the extra constraint that the candidate and
+those neighbours hold no mine; these enumerations are memoized by the constraint [store]
+along with the plain ones. Neighbours outside the component keep their own probabilities. Once lookahead_time_budget has passed the
+remaining candidates keep their unconditioned score, and if the exact probabilities are over
+budget the local probabilities are used instead. Ties are broken with the optional
+np.random.Generator [rng]."""
+
+
+def select_tile_with_best_lookahead(board_state, bomb_count, store=None, rng=None):
+    deadline = clock() + lookahead_time_budget
+    if store is None:
+        store = csp.ConstraintStore()
+        store.rebuild(board_state)
+    model = csp.probability_model(
+        board_state,
+        bomb_count,
+        store,
+        exact_max_component_cells,
+        lookahead_time_budget,
+    )
+    if model is None:
+        probabilities = local_probability_map(board_state, bomb_count)
+        weighted_components = []
     else:
-        r, c = select_tile_with_lowest_local_probability(board_state, bomb_count)
-        return ("open", r, c)
+        probabilities, weighted_components = model
+    board_state = np.asarray(board_state)
+    row_size, col_size = board_state.shape
+
+    # the chance of each tile being safe: 0 for flags and 1 for opened tiles
+    safe_probabilities = np.where(board_state == -1, 1 - probabilities, 1.0)
+    safe_probabilities[board_state == -2] = 0
+
+    cell_components = {}
+    for component, weights in weighted_components:
+        for cells, _ in component:
+            for cell in cells:
+                cell_components[cell] = (component, weights)
+
+    # the unconditioned score of every tile, from the chance that all its neighbours are safe
+    padded = np.ones((row_size + 2, col_size + 2))
+    padded[1:-1, 1:-1] = safe_probabilities
+    opening_probabilities = np.ones(board_state.shape)
+    for i, j in coordinates:
+        opening_probabilities *= padded[
+            1 + i : 1 + i + row_size, 1 + j : 1 + j + col_size
+        ]
+    tile_scores = (1 - probabilities) * (1 + lookahead_weight * opening_probabilities)
+
+    lowest_probability = np.amin(probabilities)
+    if lowest_probability == 0:
+        candidates = np.argwhere(probabilities == 0)
+    else:
+        candidates = np.argwhere(
+            probabilities <= lowest_probability + lookahead_probability_margin
+        )
+
+    # shortlist the best unconditioned scores, breaking ties at random
+    scores = tile_scores[tuple(candidates.T)]
+    keys = (np.random if rng is None else rng).random(len(candidates))
+    order = np.lexsort((keys, -scores))[:lookahead_max_candidates]
+    candidates = candidates[order].tolist()
+    scores = scores[order].tolist()
+
+    # rescore the shortlisted frontier tiles with the exact chance that the tile and all its
+    # neighbours in its component are safe together, divided by the chance the tile is safe
+    for index, (r, c) in enumerate(candidates):
+        if (r, c) not in cell_components or clock() >= deadline:
+            continue
+        component, weights = cell_components[(r, c)]
+        try:
+            cells, totals = store.enumerate(component, deadline)
+            neighbours = [
+                (r + i, c + j)
+                for i, j in sorted(coordinates)
+                if 0 <= r + i < row_size and 0 <= c + j < col_size
+            ]
+            inside = tuple(cell for cell in neighbours if cell in cells)
+            _, safe_totals = store.enumerate(
+                component + [(((r, c),) + inside, 0)], deadline
+            )
+        except csp.BudgetExceeded:
+            continue
+        candidate = cells.index((r, c))
+        safe_total = sum(
+            (count - cell_counts[candidate]) * weights[k]
+            for k, (count, cell_counts) in totals.items()
+        )
+        if safe_total == 0:
+            continue
+        opening_probability = (
+            sum(count * weights[k] for k, (count, _) in safe_totals.items())
+            / safe_total
+        )
+        for cell in neighbours:
+            if cell not in inside:
+                opening_probability *= safe_probabilities[cell]
+        scores[index] = (1 - probabilities[r, c]) * (
+            1 + lookahead_weight * opening_probability
+        )
+
+    # find all candidates with the best score and select a random one
+    best = [tile for tile, score in zip(candidates, scores) if score == max(scores)]
+    select = random_index(len(best), rng)
+    return best[select][0], best[select][1]
+
+
+"""The state of the AI for a single game: its knowledge base, the queue of certain
+moves still to be made and the frontier constraints of the game. A session is
+created per game, so many games can be solved at the same time in one process.
+Guesses are drawn from the np.random.Generator [rng], or from the global np.random
+if not given. Every move is recorded in the solver_stats.SolverStats [stats] if given."""
+
+
+class SolverSession(object):
+    def __init__(self, rng=None, stats=None):
+        self.rng = rng
+        self.stats = stats
+
+        # represents the knowledge base of the AI, so that moves are not duplicated
+        self.mines = set()
+        self.empty = set()
+
+        # store moves as a tripple - (opp, r, c) - where opp is "flag" or "mine" and
+        # and r and c represent coordinates row and columns respectively
+        self.queue = deque()
+
+        # the frontier constraints of the game, updated with the tiles changed by each move
+        self.store = csp.ConstraintStore()
+
+        # how the last move was found: "queue", "certain", "random", "local", "exact" or
+        # "lookahead"
+        self.move_source = None
+
+    def reset(self):
+        self.queue.clear()
+        self.mines.clear()
+        self.empty.clear()
+
+    def enqueue_moves(self, moves):
+        for opp, r, c in moves:
+            if opp == "flag" and (r, c) not in self.mines:
+                self.queue.append((opp, r, c))
+                self.mines.add((r, c))
+            elif opp == "open" and (r, c) not in self.empty:
+                self.queue.append((opp, r, c))
+                self.empty.add((r, c))
+
+    """Given a board_state output an opp: open or flag, an a coordinate r, c to do such
+    operation. [changed] holds the tiles changed by the last move, if known."""
+
+    # certain_move shows how we developed the AI's certain move strategy
+    # 0 is the basic strategy where it makes a move based on information at a single point
+    # 1 takes into account all the information we know and creates a constraint satisfaction problem
+
+    # uncertain_move shows how we developed the AI's uncertain move strategy
+    # 0 is the basic strategy where it makes a random move if there are no certain moves
+    # 1 takes into account the locaal probability of each tile and returns the one with lowest chance of being a mine
+    # 2 computes the exact probability of each tile from every valid mine assignment of the frontier,
+    #   falling back to 1 when the enumeration is over budget
+    # 3 ranks the safest tiles by their exact probability combined with the chance that they reveal
+    #   a 0 and open their neighbours
+    def next_move(
+        self,
+        board_state,
+        first_move,
+        bomb_count,
+        certain_move_model,
+        uncertain_move_strat,
+        changed=None,
+    ):
+        stats = self.stats
+        if stats is None:
+            return self.find_move(
+                board_state,
+                first_move,
+                bomb_count,
+                certain_move_model,
+                uncertain_move_strat,
+                changed,
+            )
+        start = clock()
+        move = self.find_move(
+            board_state,
+            first_move,
+            bomb_count,
+            certain_move_model,
+            uncertain_move_strat,
+            changed,
+        )
+        stats.add_time("move", clock() - start)
+        stats.count("moves")
+        stats.count(self.move_source + "_moves")
+        return move
+
+    """the move search of next_move, timing each of its phases if the session has stats."""
+
+    def find_move(
+        self,
+        board_state,
+        first_move,
+        bomb_count,
+        certain_move_model,
+        uncertain_move_strat,
+        changed,
+    ):
+        stats = self.stats
+        if first_move:
+            self.reset()
+
+        # rebuild the constraints from the board unless the changed tiles are known. The
+        # single point solver works on the whole board and does not need them
+        if certain_move_model or uncertain_move_strat >= 2:
+            if stats is not None:
+                start = clock()
+            if first_move or changed is None:
+                self.store.rebuild(board_state)
+            else:
+                self.store.update(board_state, changed)
+            if stats is not None:
+                stats.add_time("constraints", clock() - start)
+
+        # If a move remains from last AI call, return move
+        if self.queue:
+            self.move_source = "queue"
+            return self.queue.popleft()
+
+        if stats is not None:
+            start = clock()
+        if not certain_move_model:
+            SP_solver(board_state, self)
+        else:
+            CSP_solver(board_state, self)
+        if stats is not None:
+            stats.add_time("solve", clock() - start)
+            stats.count("solves")
+            stats.observe("moves_per_solve", len(self.queue))
+
+        # If trivial move was found, make trivial move
+        if self.queue:
+            self.move_source = "certain"
+            return self.queue.popleft()
+
+        if stats is not None:
+            start = clock()
+        move = self.guess(board_state, bomb_count, uncertain_move_strat)
+        if stats is not None:
+            stats.add_time("guess", clock() - start)
+        return move
+
+    """output a guess of the uncertain move strategy when no move is certain."""
+
+    def guess(self, board_state, bomb_count, uncertain_move_strat):
+        # if no queue chose a random unopened tile
+        if not uncertain_move_strat:
+            self.move_source = "random"
+            return random_move(board_state, self, self.rng)
+        elif uncertain_move_strat == 1:
+            self.move_source = "local"
+            r, c = select_tile_with_lowest_local_probability(
+                board_state, bomb_count, self.rng
+            )
+            return ("open", r, c)
+        elif uncertain_move_strat == 2:
+            self.move_source = "exact"
+            r, c = select_tile_with_lowest_exact_probability(
+                board_state, bomb_count, self.store, self.rng
+            )
+            return ("open", r, c)
+        else:
+            self.move_source = "lookahead"
+            r, c = select_tile_with_best_lookahead(
+                board_state, bomb_count, self.store, self.rng
+            )
+            return ("open", r, c)
+
+
+# the session used by ai_heuristic_logic
+default_session = SolverSession()
+
+"""Given a board_state output an opp: open or flag, an a coordinate r, c to do such operation,
+using a single session shared by every caller. Games that may run at the same time should
+each create their own SolverSession and call next_move instead."""
+
+
+def ai_heuristic_logic(
+    board_state,
+    first_move,
+    bomb_count,
+    certain_move_model,
+    uncertain_move_strat,
+    changed=None,
+):
+    return default_session.next_move(
+        board_state,
+        first_move,
+        bomb_count,
+        certain_move_model,
+        uncertain_move_strat,
+        changed,
+    )
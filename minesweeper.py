@@ -1,13 +1,10 @@
 import random
 import numpy as np
 import heuristic_model
+from csp import neighbour_sum
+import solver_stats
 import time
-import sys
-import io
-import contextlib
-
-# Raise recursion limit to avoid RecursionError on bigger boards
-sys.setrecursionlimit(2**16)
+import multiprocessing
 
 # initalized after the first move, board represents the data hidden to the user.
 # Each board is a certain size and has a certain mine count
@@ -25,18 +22,25 @@ flaged = -2
 coordinates = {(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)}
 
 """initalize minesweeper with a [size] x [size] board and mine count [mine]. 
-does not allow a bomb to be initated at (r,c)"""
+does not allow a bomb to be initated at (r,c). If [return_counts] is set, also output
+the amount of surrounding bombs of every tile, computed once for the whole board. The
+mines are drawn from the np.random.Generator [rng], or from the global random if not given."""
 
 
 
 
-def init_board(size, mine, r, c):
+def init_board(size, mine, r, c, return_counts=False, rng=None):
     board = np.zeros((size, size))
     first_move = r * size + c
     left = list(range(0, first_move))
     right = list(range(first_move + 1, np.square(size)))
-    bombs = random.sample(left + right, mine)
+    if rng is None:
+        bombs = random.sample(left + right, mine)
+    else:
+        bombs = rng.choice(left + right, mine, replace=False)
     board[np.unravel_index(bombs, board.shape)] = 1
+    if return_counts:
+        return board, neighbour_counts(board)
     return board
 
 
@@ -48,34 +52,76 @@ def init_board_state(size):
     return board_state
 
 
+"""Given a board, output the amount of surrounding bombs of every tile as an int8 array."""
+
+
+def neighbour_counts(board):
+    return neighbour_sum(np.asarray(board) == mine).astype(np.int8)
+
+
+"""open a tile if not flagged and output the set of newly opened tiles. In board state update
+the tile with the amount of surrounding bombs. If there are no surrounding bombs, keep opening
+the unopened neighbour tiles with a flood fill over the neighbour counts [counts] of the board,
+which are computed if not given."""
+
+
+def reveal(board_state, board, row, col, counts=None):
+    opened = set()
+    if board_state[row][col] == flaged:
+        return opened
+    if counts is None:
+        counts = neighbour_counts(board)
+    if board_state[row][col] == unopened:
+        opened.add((row, col))
+    board_state[row][col] = counts[row][col]
+    if counts[row][col] != 0 or board[row][col] == mine:
+        return opened
+    # flood fill over plain lists and write the opened tiles back in one assignment
+    row_size, col_size = len(board), len(board[0])
+    state = np.asarray(board_state).tolist()
+    count_list = np.asarray(counts).tolist()
+    stack = [(row, col)]
+    while stack:
+        r, c = stack.pop()
+        for i, j in coordinates:
+            x, y = r + i, c + j
+            if 0 <= x < row_size and 0 <= y < col_size and state[x][y] == unopened:
+                state[x][y] = count_list[x][y]
+                opened.add((x, y))
+                if count_list[x][y] == 0:
+                    stack.append((x, y))
+    if opened:
+        rows, cols = map(list, zip(*opened))
+        board_state[rows, cols] = np.asarray(counts)[rows, cols]
+    return opened
+
+
 """open a tile if not flagged. In board state update the tile with the amount of surrounding bombs.
-If there are no surrounding bombs, open the eight neighbor tiles."""
-
-
-def open_tile(board_state, board, row, col):
-    if board_state[row][col] != flaged:
-        board_state[row][col] = count_surrounding_bombs(board, row, col)
-        if board_state[row][col] == 0 and board[row][col] != mine:
-            for r, c in coordinates:
-                if (
-                    row + r >= 0
-                    and col + c >= 0
-                    and row + r < len(board)
-                    and col + c < len(board[0])
-                ):
-                    if board_state[row + r][col + c] == unopened:
-                        board_state = open_tile(board_state, board, row + r, col + c)
+If there are no surrounding bombs, open the eight neighbor tiles. If a set [changed] is given,
+every opened tile is added to it. [counts] are the neighbour counts of the board, computed if
+not given."""
+
+
+def open_tile(board_state, board, row, col, changed=None, counts=None):
+    opened = reveal(board_state, board, row, col, counts)
+    if changed is not None:
+        changed.update(opened)
     return board_state
 
 
-"""flag a single tile if it is unflagged and unopened. If flagged, unflag."""
+"""flag a single tile if it is unflagged and unopened. If flagged, unflag. If a set [changed]
+is given, the tile is added to it when its state changes."""
 
 
-def flag_tile(board_state, row, col):
+def flag_tile(board_state, row, col, changed=None):
     if board_state[row][col] != flaged and board_state[row][col] < 0:
         board_state[row][col] = flaged
     elif board_state[row][col] == flaged:
         board_state[row][col] = unopened
+    else:
+        return board_state
+    if changed is not None:
+        changed.add((row, col))
     return board_state
 
 
@@ -119,6 +165,104 @@ def game_won(board_state, bomb_count):
     return open_tiles == len(board_state) * len(board_state[0]) - bomb_count
 
 
+"""keep track of whether a game has been won or lost with running counters, so the checks
+are constant time. Every set of tiles opened by reveal is passed to record_open, which counts
+the opened empty tiles and notes when a mine has been opened. Flagging a tile does not change
+the outcome of a game, so only opened tiles are recorded."""
+
+
+class GameStatus(object):
+    def __init__(self, board_size, bomb_count):
+        self.empty_tiles = board_size * board_size - bomb_count
+        self.opened_empty = 0
+        self.mine_hit = False
+
+    def record_open(self, board, opened):
+        for r, c in opened:
+            if board[r][c] == mine:
+                self.mine_hit = True
+            else:
+                self.opened_empty += 1
+
+    def lost(self):
+        return self.mine_hit
+
+    def won(self):
+        return not self.mine_hit and self.opened_empty == self.empty_tiles
+
+
+"""a single headless minesweeper game. The mines, the amount of surrounding bombs of every
+tile and the board state the user can see are held as compact uint8 and int8 arrays, and the
+mines are placed on the first opened tile so that it is never a mine unless [mines] is given,
+drawn from the np.random.Generator [rng] if given. open, flag and chord output the set of
+tiles they changed, and won and lost are kept up to date by a GameStatus."""
+
+
+class Game(object):
+    __slots__ = (
+        "size",
+        "bomb_count",
+        "mines",
+        "counts",
+        "state",
+        "status",
+        "started",
+        "rng",
+    )
+
+    def __init__(self, size, bomb_count, mines=None, rng=None):
+        self.size = size
+        self.bomb_count = bomb_count
+        self.rng = rng
+        self.mines = np.zeros((size, size), dtype=np.uint8)
+        self.counts = np.zeros((size, size), dtype=np.uint8)
+        self.state = np.full((size, size), unopened, dtype=np.int8)
+        self.status = GameStatus(size, bomb_count)
+        self.started = False
+        if mines is not None:
+            self.place_mines(mines)
+
+    def place_mines(self, mines):
+        self.mines[...] = mines
+        self.counts[...] = neighbour_counts(self.mines)
+        self.started = True
+
+    def open(self, row, col):
+        if not self.started:
+            mines = init_board(self.size, self.bomb_count, row, col, rng=self.rng)
+            self.place_mines(mines)
+        opened = reveal(self.state, self.mines, row, col, self.counts)
+        self.status.record_open(self.mines, opened)
+        return opened
+
+    def flag(self, row, col):
+        changed = set()
+        flag_tile(self.state, row, col, changed)
+        return changed
+
+    def chord(self, row, col):
+        opened = set()
+        if self.state[row][col] <= 0:
+            return opened
+        neighbours = [
+            (row + r, col + c)
+            for r, c in coordinates
+            if 0 <= row + r < self.size and 0 <= col + c < self.size
+        ]
+        flags = sum(1 for r, c in neighbours if self.state[r][c] == flaged)
+        if flags == self.state[row][col]:
+            for r, c in neighbours:
+                if self.state[r][c] == unopened:
+                    opened |= self.open(r, c)
+        return opened
+
+    def won(self):
+        return self.status.won()
+
+    def lost(self):
+        return self.status.lost()
+
+
 """print a row of the game board to the console."""
 
 
@@ -143,17 +287,98 @@ def print_board(board, board_state):
         print()
 
 
-"""game loop for minesweeper game mode."""
+"""receives the events of a game played by game_loop. Every method does nothing, so an
+observer only overrides the events it needs. [source] is how the move was found: "human" or
+the move_source of the AI's SolverSession."""
 
 
-def printed_game_loop(
-    mode, bomb_count, board_size, certain_move_model, uncertain_move_strat
+class GameObserver(object):
+    def on_move(self, game, opp, r, c, source):
+        pass
+
+    def on_message(self, message):
+        pass
+
+    def on_end(self, game, won, move_count):
+        pass
+
+
+"""prints every move and the board after it to the console."""
+
+
+class PrintObserver(GameObserver):
+    def on_move(self, game, opp, r, c, source):
+        if source == "random":
+            print("random!")
+        print()
+        print("Move: " + opp + " " + str(r) + " " + str(c))
+        print_board(game.mines, game.state)
+
+    def on_message(self, message):
+        print(message)
+
+    def on_end(self, game, won, move_count):
+        if won:
+            print("you won")
+        else:
+            print("you lost")
+
+
+"""records the moves of a game as a compact list of (opp, r, c) triples."""
+
+
+class MoveLogObserver(GameObserver):
+    def __init__(self):
+        self.moves = []
+
+    def on_move(self, game, opp, r, c, source):
+        self.moves.append((opp, int(r), int(c)))
+
+
+"""game loop for minesweeper game mode. Nothing is printed or formatted; every move and the
+end of the game are passed to [observer] if given. If a [seed], an int or a SeedSequence, is
+given, the board and the guesses of the AI are drawn from two independent generators spawned
+from it, so the game is reproducible and the mines drawn do not depend on how many guesses the
+AI makes. A fixed board can be played instead by giving its [mines] and
+[first_click], which is opened as the first move. The solver stats of the game are added to
+the solver_stats.SolverStats [stats] if given. Output whether the game was won and the
+amount of moves made."""
+
+
+def game_loop(
+    mode,
+    bomb_count,
+    board_size,
+    certain_move_model,
+    uncertain_move_strat,
+    observer=None,
+    seed=None,
+    mines=None,
+    first_click=None,
+    stats=None,
 ):
-    board = np.zeros((board_size, board_size))
-    board_state = init_board_state(board_size)
+    board_rng = solver_rng = None
+    if seed is not None:
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        board_seed, solver_seed = seed.spawn(2)
+        board_rng = np.random.default_rng(board_seed)
+        solver_rng = np.random.default_rng(solver_seed)
+    game = Game(board_size, bomb_count, mines, board_rng)
+    game_stats = None if stats is None else solver_stats.SolverStats()
+    session = heuristic_model.SolverSession(solver_rng, game_stats)
     move_count = 0
     first_move = True
-    while not game_won(board_state, bomb_count) and not game_lost(board, board_state):
+    changed = None
+    source = "human"
+    if first_click is not None:
+        r, c = first_click
+        game.open(r, c)
+        first_move = False
+        move_count += 1
+        if observer is not None:
+            observer.on_move(game, "open", r, c, "first click")
+    while not game.won() and not game.lost():
         if mode == "human":
             read = input()
             read_split = read.split()
@@ -167,33 +392,58 @@ def printed_game_loop(
                 r = int(read_split[1])
                 c = int(read_split[2])
                 if r < 0 or c < 0 or r >= board_size or c >= board_size:
-                    print("Out of bounds")
+                    if observer is not None:
+                        observer.on_message("Out of bounds")
                     continue
         else:
-            opp, r, c = heuristic_model.ai_heuristic_logic(
-                board_state,
+            opp, r, c = session.next_move(
+                game.state,
                 first_move,
                 bomb_count,
                 certain_move_model,
                 uncertain_move_strat,
+                changed,
             )
+            source = session.move_source
+            # the session is fresh, so only its first call needs to reset it
+            first_move = False
+        changed = set()
         if opp == "open":
-            if first_move:
-                board = init_board(board_size, bomb_count, r, c)
-                first_move = False
-            board_state = open_tile(board_state, board, r, c)
+            changed = game.open(r, c)
         if opp == "flag":
-            board_state = flag_tile(board_state, r, c)
-        print()
+            changed = game.flag(r, c)
+        if opp == "chord":
+            changed = game.chord(r, c)
         move_count += 1
-        print("Move: " + opp + " " + str(r) + " " + str(c))
-        print_board(board, board_state)
-    if game_lost(board, board_state):
-        print("you lost")
-        return False, move_count
-    else:
-        print("you won")
-        return True, move_count
+        if observer is not None:
+            observer.on_move(game, opp, r, c, source)
+    won = game.won()
+    if stats is not None:
+        game_stats.count("wins", int(won))
+        stats.add_game(game_stats)
+    if observer is not None:
+        observer.on_end(game, won, move_count)
+    return won, move_count
+
+
+"""game loop for minesweeper game mode that prints every move and the board to the console."""
+
+
+def printed_game_loop(
+    mode, bomb_count, board_size, certain_move_model, uncertain_move_strat
+):
+    return game_loop(
+        mode,
+        bomb_count,
+        board_size,
+        certain_move_model,
+        uncertain_move_strat,
+        PrintObserver(),
+    )
+
+
+# the record array of game results output by generate_data
+data_dtype = [("wins", "i4"), ("times", "f8"), ("move_counts", "i4")]
 
 
 """output the number of wins for a given number of trials"""
@@ -207,7 +457,9 @@ def trials():
         input("input certain move model: SP_Solver(0), CSP_Solver(1)")
     )
     uncertain_move_strat = int(
-        input("input uncertain move strategy: random(0), local probability(1)")
+        input(
+            "input uncertain move strategy: random(0), local probability(1), exact probability(2), lookahead(3)"
+        )
     )
     count = iterations
 
@@ -227,33 +479,142 @@ def trials():
     print("elapsed time: " + str(end_time - start_time))
 
 
+"""play [iterations] ai games and output a record array of whether each game was won, the
+time since the start at which it finished and its amount of moves. Every game is passed to
+[observer] if given, for example a game_records.GameRecordWriter, and the solver stats of
+every game are merged into the solver_stats.SolverStats [stats] if given. If a [seed], an
+int or a SeedSequence, is given every game is played with its own seed spawned from it, so
+the games are reproducible; otherwise they draw from the global random state."""
+
+
 def generate_data(
-    board_size, bomb_count, certain_move_model, uncertain_move_strat, iterations
+    board_size,
+    bomb_count,
+    certain_move_model,
+    uncertain_move_strat,
+    iterations,
+    observer=None,
+    stats=None,
+    seed=None,
 ):
     wins_arr = []
     times_arr = []
     move_count_arr = []
+    if seed is None:
+        game_seeds = [None] * iterations
+    else:
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        game_seeds = seed.spawn(iterations)
     start_time = time.time()
-    while iterations > 0:
-        with contextlib.redirect_stdout(io.StringIO()):
-            is_win, move_count = printed_game_loop(
-                "ai", bomb_count, board_size, certain_move_model, uncertain_move_strat
-            )
+    for game_seed in game_seeds:
+        is_win, move_count = game_loop(
+            "ai",
+            bomb_count,
+            board_size,
+            certain_move_model,
+            uncertain_move_strat,
+            observer,
+            seed=game_seed,
+            stats=stats,
+        )
         if is_win:
             wins_arr.append(1)
         else:
             wins_arr.append(0)
         times_arr.append(time.time() - start_time)
         move_count_arr.append(move_count)
-        iterations -= 1
 
     data = np.array(
         list(zip(wins_arr, times_arr, move_count_arr)),
-        dtype=[("wins", "i4"), ("times", "f8"), ("move_counts", "i4")],
+        dtype=data_dtype,
     )
     return data
 
 
+"""play a chunk of [iterations] ai games in a worker process, each seeded from its own seed
+spawned from [seed_sequence] so that the chunk is reproducible whichever worker runs it.
+Output a list of (win, end time, move count) tuples, one per game."""
+
+
+def play_chunk(args):
+    board_size, bomb_count, certain_move_model, uncertain_move_strat = args[:4]
+    iterations, seed_sequence = args[4:]
+    results = []
+    for game_seed in seed_sequence.spawn(iterations):
+        is_win, move_count = game_loop(
+            "ai",
+            bomb_count,
+            board_size,
+            certain_move_model,
+            uncertain_move_strat,
+            seed=game_seed,
+        )
+        results.append((int(is_win), time.time(), move_count))
+    return results
+
+
+"""play [iterations] ai games on a pool of [workers] processes, in chunks of [chunk_size]
+games. Every chunk gets its own seed spawned from [seed], so a run is reproducible for the
+same seed and chunk size regardless of the amount of workers. Yields a (win, end time, move
+count) tuple per game as soon as its chunk finishes, in chunk order."""
+
+
+def iter_game_results(
+    board_size,
+    bomb_count,
+    certain_move_model,
+    uncertain_move_strat,
+    iterations,
+    workers=None,
+    seed=None,
+    chunk_size=10,
+):
+    sizes = [chunk_size] * (iterations // chunk_size)
+    if iterations % chunk_size:
+        sizes.append(iterations % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [
+        (board_size, bomb_count, certain_move_model, uncertain_move_strat, size, ss)
+        for size, ss in zip(sizes, seeds)
+    ]
+    with multiprocessing.Pool(workers) as pool:
+        for results in pool.imap(play_chunk, tasks):
+            yield from results
+
+
+"""the parallel version of generate_data, playing the games with iter_game_results and
+merging them into the same record array. times holds the time since the start of the run
+at which each game finished."""
+
+
+def generate_data_parallel(
+    board_size,
+    bomb_count,
+    certain_move_model,
+    uncertain_move_strat,
+    iterations,
+    workers=None,
+    seed=None,
+    chunk_size=10,
+):
+    start_time = time.time()
+    results = [
+        (is_win, end_time - start_time, move_count)
+        for is_win, end_time, move_count in iter_game_results(
+            board_size,
+            bomb_count,
+            certain_move_model,
+            uncertain_move_strat,
+            iterations,
+            workers,
+            seed,
+            chunk_size,
+        )
+    ]
+    return np.array(results, dtype=data_dtype)
+
+
 def main():
     trials()
 
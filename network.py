@@ -1,3 +1,4 @@
+import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
@@ -10,10 +11,11 @@ class DQN(nn.Module):
         self.layer3 = nn.Linear(num_dense, num_actions)
         
 
+    #outputs one unnormalized Q-value per action, so every row depends only on its own board
     def forward(self, x):
         x = F.relu(self.layer1(x))
         x = F.relu(self.layer2(x))
-        return F.softmax(x, 0)
+        return self.layer3(x)
     
 
 class DQN2(nn.Module):
@@ -30,3 +32,18 @@ class DQN2(nn.Module):
         x = x.view(batch_size, -1)
         x = self.fc(x)
         return F.softmax(x)
+
+
+#Polyak update of the target network in place: target = tau * source + (1 - tau) * target,
+#over all parameters at once with foreach ops and without building state dicts
+def soft_update(target_net, source_net, tau):
+    with torch.no_grad():
+        target_params = list(target_net.parameters())
+        source_params = list(source_net.parameters())
+        torch._foreach_mul_(target_params, 1 - tau)
+        torch._foreach_add_(target_params, source_params, alpha=tau)
+
+
+#the tau that, applied once every [every] steps, moves the target as far as [tau] applied every step
+def soft_update_tau(tau, every):
+    return 1 - (1 - tau) ** every
@@ -0,0 +1,117 @@
+import numpy as np
+import torch
+
+import sum_tree
+
+"""a replay memory of [capacity] transitions held in preallocated tensors on [device]. Board
+states of [num_tiles] tiles are stored as int8, actions as int16, so a million transitions of
+an expert board take about 1 GB. push writes a batch of transitions at the ring position and
+sample gathers a batch of random indices, drawn with replacement, from every tensor at once."""
+
+
+class TensorReplayMemory(object):
+    def __init__(self, capacity, num_tiles, device=None):
+        self.capacity = capacity
+        self.device = device
+        self.states = torch.zeros(
+            (capacity, num_tiles), dtype=torch.int8, device=device
+        )
+        self.next_states = torch.zeros(
+            (capacity, num_tiles), dtype=torch.int8, device=device
+        )
+        self.actions = torch.zeros(capacity, dtype=torch.int16, device=device)
+        self.rewards = torch.zeros(capacity, dtype=torch.float32, device=device)
+        self.dones = torch.zeros(capacity, dtype=torch.bool, device=device)
+        self.position = 0
+        self.size = 0
+
+    """save a batch of transitions: (K, num_tiles) [state] and [next_state], and K [action],
+    [reward] and [done] values. The next state of a done transition is never used. Output
+    the indices the transitions were written to."""
+
+    def push(self, state, action, next_state, reward, done):
+        count = state.size(0)
+        indices = torch.arange(self.position, self.position + count, device=self.device)
+        indices %= self.capacity
+        self.states[indices] = state.to(self.device, torch.int8)
+        self.next_states[indices] = next_state.to(self.device, torch.int8)
+        self.actions[indices] = action.view(-1).to(self.device, torch.int16)
+        self.rewards[indices] = reward.view(-1).to(self.device, torch.float32)
+        self.dones[indices] = done.view(-1).to(self.device, torch.bool)
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+        return indices
+
+    def sample_indices(self, batch_size):
+        return torch.randint(0, self.size, (batch_size,), device=self.device)
+
+    """output a batch of [batch_size] random transitions as float states, (batch_size, 1)
+    long actions, rewards, float next states and done flags, followed by the importance
+    sampling weights of the transitions, all 1, and their indices."""
+
+    def sample(self, batch_size):
+        indices = self.sample_indices(batch_size)
+        weights = torch.ones(batch_size, device=self.device)
+        return self.gather(indices) + (weights, indices)
+
+    """uniform sampling has no priorities to update."""
+
+    def update_priorities(self, indices, td_errors):
+        pass
+
+    def gather(self, indices):
+        return (
+            self.states[indices].float(),
+            self.actions[indices].long().unsqueeze(1),
+            self.rewards[indices],
+            self.next_states[indices].float(),
+            self.dones[indices],
+        )
+
+    def __len__(self):
+        return self.size
+
+
+"""a TensorReplayMemory that samples transitions in proportion to their priority, kept in a
+sum_tree.SumTree. The priority of a transition is (|td error| + [epsilon]) ** [alpha]; new
+transitions get the highest priority seen so far so they are replayed at least once. Samples
+are stratified over the total priority, and each comes with the importance sampling weight
+(N * P(i)) ** -beta, divided by the largest weight of the batch, which corrects the loss for
+the non-uniform sampling. [beta] should be annealed towards 1 during training."""
+
+
+class PrioritizedReplayMemory(TensorReplayMemory):
+    def __init__(
+        self, capacity, num_tiles, device=None, alpha=0.6, beta=0.4, epsilon=1e-6
+    ):
+        super(PrioritizedReplayMemory, self).__init__(capacity, num_tiles, device)
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.priorities = sum_tree.SumTree(capacity)
+        self.max_priority = 1.0
+
+    def push(self, state, action, next_state, reward, done):
+        indices = super(PrioritizedReplayMemory, self).push(
+            state, action, next_state, reward, done
+        )
+        priorities = np.full(len(indices), self.max_priority)
+        self.priorities.update(indices.cpu().numpy(), priorities)
+        return indices
+
+    def sample(self, batch_size):
+        total = self.priorities.total()
+        segments = (np.arange(batch_size) + np.random.random(batch_size)) / batch_size
+        indices = self.priorities.find(segments * total)
+        probabilities = self.priorities.get(indices) / total
+        weights = (self.size * probabilities) ** -self.beta
+        weights /= weights.max()
+        indices = torch.from_numpy(indices).to(self.device)
+        weights = torch.as_tensor(weights, dtype=torch.float32, device=self.device)
+        return self.gather(indices) + (weights, indices)
+
+    def update_priorities(self, indices, td_errors):
+        td_errors = td_errors.detach().abs().cpu().numpy()
+        priorities = (td_errors + self.epsilon) ** self.alpha
+        self.priorities.update(indices.cpu().numpy(), priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
@@ -0,0 +1,70 @@
+import time
+from collections import Counter, defaultdict
+
+# the clock used to time the phases of the solver
+clock = time.perf_counter
+
+"""the instrumentation of the heuristic AI. A SolverSession given a SolverStats counts its
+moves (queue hits, fresh solves, certain moves and guesses by strategy), accumulates the
+time spent in each phase of a move and keeps histograms of the phase latencies and of the
+size of every frontier component it solves. Sessions without stats skip all of it.
+Stats of many games can be merged, and if [keep_games] is set the stats of each game are
+also kept in games."""
+
+
+class SolverStats(object):
+    def __init__(self, keep_games=False):
+        self.keep_games = keep_games
+        self.counters = Counter()
+        self.timings = defaultdict(float)
+        self.histograms = defaultdict(Counter)
+        self.games = []
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    """add a [value] to the histogram [name]."""
+
+    def observe(self, name, value):
+        self.histograms[name][value] += 1
+
+    """add [seconds] to the total time of [phase] and its latency to the histogram
+    phase_us, bucketed to the next power of two microseconds."""
+
+    def add_time(self, phase, seconds):
+        self.timings[phase] += seconds
+        self.observe(phase + "_us", 1 << max(int(seconds * 1e6), 0).bit_length())
+
+    def merge(self, other):
+        self.counters.update(other.counters)
+        for phase, seconds in other.timings.items():
+            self.timings[phase] += seconds
+        for name, histogram in other.histograms.items():
+            self.histograms[name].update(histogram)
+
+    """merge the stats of a single game that just ended."""
+
+    def add_game(self, game_stats):
+        self.merge(game_stats)
+        self.count("games")
+        if self.keep_games:
+            self.games.append(game_stats.as_dict())
+
+    def reset(self):
+        self.counters.clear()
+        self.timings.clear()
+        self.histograms.clear()
+        self.games = []
+
+    """output the stats as a dictionary of plain counters, timings in seconds and sorted
+    histograms, ready to be dumped as json."""
+
+    def as_dict(self):
+        return {
+            "counters": dict(self.counters),
+            "timings": dict(self.timings),
+            "histograms": {
+                name: dict(sorted(histogram.items()))
+                for name, histogram in self.histograms.items()
+            },
+        }
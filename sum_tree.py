@@ -0,0 +1,44 @@
+import numpy as np
+
+"""a binary tree over [capacity] non-negative priorities in which every node holds the sum of
+its two children, stored in one array with the root at index 1 and the leaves at
+[leaf_count, 2 * leaf_count). Updating a batch of priorities and finding the leaves of a
+batch of prefix sums both take O(log n) array operations, each over the whole batch."""
+
+
+class SumTree(object):
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.leaf_count = 1 << max(capacity - 1, 0).bit_length()
+        self.depth = self.leaf_count.bit_length() - 1
+        self.tree = np.zeros(2 * self.leaf_count)
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, indices):
+        return self.tree[np.asarray(indices) + self.leaf_count]
+
+    """set the priorities of the leaves [indices] and update the sums of their ancestors,
+    one level of the tree at a time."""
+
+    def update(self, indices, priorities):
+        nodes = np.asarray(indices) + self.leaf_count
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    """output the leaf whose range of prefix sums holds each of the [values], all between 0
+    and the total. Subtrees with a sum of 0 are never entered, even for a value of exactly 0
+    or with rounding errors, so leaves with priority 0 are never output."""
+
+    def find(self, values):
+        values = np.array(values, dtype=float)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = self.tree[2 * nodes]
+            right = ((values > left) | (left == 0)) & (self.tree[2 * nodes + 1] > 0)
+            values -= np.where(right, left, 0)
+            nodes = 2 * nodes + right
+        return nodes - self.leaf_count
@@ -1,11 +1,31 @@
+import batch
+import benchmark
+import corpus
+import csp
+import DQN_Env
+import game_records
 import heuristic_model
 import minesweeper
+import solver_stats
+import sum_tree
 from heuristic_model import SP_solver, CSP_solver, ai_heuristic_logic
 import numpy as np
 import unittest
+import contextlib
+import io
+import os
+import tempfile
 from sympy import *
 from collections import deque
 
+# the DQN modules need torch, whose tests are skipped when it is not installed
+try:
+    import torch
+    import network
+    import replay_memory
+except ImportError:
+    torch = None
+
 
 def init_test_board(size, m_indices):
     init_board = np.zeros((size, size))
@@ -48,6 +68,17 @@ class TestInitBoard(unittest.TestCase):
             )
             self.assertEqual(init_board[4, 4], 0, "start tile should be empty")
 
+    def test_init_board_counts(self):
+        board, counts = minesweeper.init_board(10, 20, 4, 4, return_counts=True)
+        for r in range(10):
+            for c in range(10):
+                expected_val = minesweeper.count_surrounding_bombs(board, r, c)
+                self.assertEqual(
+                    counts[r][c],
+                    expected_val,
+                    f"expected {expected_val} but got {counts[r][c]}",
+                )
+
 
 class TestInitBoardState(unittest.TestCase):
     def test_init_board_state(self):
@@ -378,5 +409,928 @@ class TestCountSurroundingBombsCorner(unittest.TestCase):
             actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
         )
 
+
+class TestCSPSolver(unittest.TestCase):
+    def test_frontier_constraints(self):
+        m_indices = [(0, 0)]
+        board = init_test_board(2, m_indices)
+        board_state = init_test_board_state(2, [], [(0, 1), (1, 1)], board)
+        actual_val = csp.frontier_constraints(board_state)
+        expected_val = [(((0, 0), (1, 0)), 1), (((0, 0), (1, 0)), 1)]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+
+    def test_certain_moves_single_point(self):
+        m_indices = [(0, 0)]
+        board = init_test_board(2, m_indices)
+        board_state = init_test_board_state(2, [], [(0, 1), (1, 0), (1, 1)], board)
+        actual_val = csp.certain_moves(csp.frontier_constraints(board_state))
+        expected_val = [("flag", 0, 0)]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+
+    def test_certain_moves_needs_reduction(self):
+        # a 1-2-1 pattern over three unopened tiles has no single point move
+        m_indices = [(1, 0), (1, 2)]
+        board = init_test_board(3, m_indices)
+        board_state = init_test_board_state(3, [], [(0, 0), (0, 1), (0, 2)], board)
+        actual_val = heuristic_model.SP_solver(board_state)
+        self.assertFalse(actual_val, "single point solver found a move")
+        actual_val = csp.certain_moves(csp.frontier_constraints(board_state))
+        expected_val = [("flag", 1, 0), ("open", 1, 1), ("flag", 1, 2)]
+        self.assertEqual(
+            sorted(actual_val),
+            sorted(expected_val),
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+
+class TestConstraintStore(unittest.TestCase):
+    def test_update_matches_rebuild(self):
+        m_indices = [(0, 0), (3, 4), (4, 1)]
+        board = init_test_board(5, m_indices)
+        board_state = init_test_board_state(5, [], [], board)
+        store = csp.ConstraintStore()
+        store.rebuild(board_state)
+        for opp, r, c in [
+            ("open", 2, 2),
+            ("flag", 0, 0),
+            ("open", 4, 4),
+            ("open", 0, 4),
+        ]:
+            changed = set()
+            if opp == "open":
+                board_state = minesweeper.open_tile(board_state, board, r, c, changed)
+            else:
+                board_state = minesweeper.flag_tile(board_state, r, c, changed)
+            store.update(board_state, changed)
+            expected_val = csp.ConstraintStore()
+            expected_val.rebuild(board_state)
+            self.assertEqual(
+                store.constraints,
+                expected_val.constraints,
+                f"expected {expected_val.constraints} but got {store.constraints}",
+            )
+
+    def test_take_dirty_only_returns_changes(self):
+        m_indices = [(0, 0)]
+        board = init_test_board(3, m_indices)
+        board_state = init_test_board_state(3, [], [], board)
+        store = csp.ConstraintStore()
+        store.rebuild(board_state)
+        changed = set()
+        board_state = minesweeper.open_tile(board_state, board, 1, 1, changed)
+        store.update(board_state, changed)
+        actual_val = store.take_dirty()
+        expected_val = [
+            (((0, 0), (0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1), (2, 2)), 1)
+        ]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+        self.assertEqual(store.take_dirty(), [], "dirty constraints were not cleared")
+
+    def test_components_are_independent(self):
+        m_indices = [(0, 0), (0, 6)]
+        board = np.zeros((2, 7))
+        board[0][0] = board[0][6] = 1
+        board_state = np.full((2, 7), -1)
+        for c in [0, 1, 5, 6]:
+            board_state = minesweeper.open_tile(board_state, board, 1, c)
+        store = csp.ConstraintStore()
+        store.rebuild(board_state)
+        actual_val = store.take_dirty_components()
+        self.assertEqual(
+            len(actual_val), 2, f"expected 2 components but got {actual_val}"
+        )
+        changed = set()
+        board_state = minesweeper.flag_tile(board_state, 0, 6, changed)
+        store.update(board_state, changed)
+        actual_val = store.take_dirty_components()
+        expected_val = [[(((0, 4), (0, 5), (1, 4)), 0), (((0, 5),), 0)]]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+
+
+class TestMineProbabilities(unittest.TestCase):
+    def test_mine_probabilities_binomial_weighting(self):
+        m_indices = [(1, 1), (2, 2)]
+        board = init_test_board(3, m_indices)
+        board_state = init_test_board_state(3, [], [(0, 0)], board)
+        store = csp.ConstraintStore()
+        store.rebuild(board_state)
+        actual_val = csp.mine_probabilities(board_state, 2, store)
+        expected_val = np.full((3, 3), 1 / 5)
+        expected_val[0][0] = 2
+        expected_val[0][1] = expected_val[1][0] = expected_val[1][1] = 1 / 3
+        self.assertTrue(
+            np.allclose(actual_val, expected_val),
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+    def test_mine_probabilities_certain_mine(self):
+        m_indices = [(0, 0)]
+        board = init_test_board(2, m_indices)
+        board_state = init_test_board_state(2, [], [(0, 1), (1, 0), (1, 1)], board)
+        store = csp.ConstraintStore()
+        store.rebuild(board_state)
+        actual_val = csp.mine_probabilities(board_state, 1, store)
+        expected_val = np.array([[1, 2], [2, 2]])
+        self.assertTrue(
+            np.allclose(actual_val, expected_val),
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+    def test_mine_probabilities_over_budget(self):
+        m_indices = [(1, 1), (2, 2)]
+        board = init_test_board(3, m_indices)
+        board_state = init_test_board_state(3, [], [(0, 0)], board)
+        store = csp.ConstraintStore()
+        store.rebuild(board_state)
+        actual_val = csp.mine_probabilities(board_state, 2, store, 2)
+        self.assertIsNone(actual_val, f"expected None but got {actual_val}")
+
+
+class TestReveal(unittest.TestCase):
+    def test_reveal_returns_opened_tiles(self):
+        m_indices = [(0, 2), (1, 2), (2, 2)]
+        board = init_test_board(3, m_indices)
+        board_state = init_test_board_state(3, [], [], board)
+        actual_val = minesweeper.reveal(board_state, board, 0, 0)
+        expected_val = {(0, 0), (0, 1), (1, 0), (1, 1), (2, 0), (2, 1)}
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+        actual_val = minesweeper.reveal(board_state, board, 0, 0)
+        self.assertEqual(actual_val, set(), f"expected no tiles but got {actual_val}")
+
+    def test_reveal_large_board(self):
+        board = init_test_board(200, [(199, 199)])
+        board_state = minesweeper.init_board_state(200)
+        actual_val = minesweeper.reveal(board_state, board, 0, 0)
+        self.assertEqual(
+            len(actual_val), 200 * 200 - 1, "expected all but one tile opened"
+        )
+
+    def test_neighbour_counts(self):
+        m_indices = [(0, 0), (6, 6), (4, 5), (5, 6)]
+        board = init_test_board(10, m_indices)
+        actual_val = minesweeper.neighbour_counts(board)
+        for r in range(10):
+            for c in range(10):
+                expected_val = minesweeper.count_surrounding_bombs(board, r, c)
+                self.assertEqual(
+                    actual_val[r][c],
+                    expected_val,
+                    f"expected {expected_val} but got {actual_val[r][c]}",
+                )
+
+
+class TestGameStatus(unittest.TestCase):
+    def test_game_status_won(self):
+        m_indices = [(0, 0)]
+        board = init_test_board(2, m_indices)
+        board_state = init_test_board_state(2, [], [], board)
+        status = minesweeper.GameStatus(2, 1)
+        for r, c in [(0, 1), (1, 0), (1, 1)]:
+            self.assertFalse(status.won(), "game won before all tiles were opened")
+            status.record_open(board, minesweeper.reveal(board_state, board, r, c))
+        self.assertTrue(status.won(), "game not won after all tiles were opened")
+        self.assertFalse(status.lost(), "game lost without opening a mine")
+
+    def test_game_status_lost(self):
+        m_indices = [(4, 4)]
+        board = init_test_board(10, m_indices)
+        board_state = init_test_board_state(10, [], [], board)
+        status = minesweeper.GameStatus(10, 1)
+        status.record_open(board, minesweeper.reveal(board_state, board, 4, 4))
+        self.assertEqual(
+            status.lost(),
+            minesweeper.game_lost(board, board_state),
+            "status does not match game_lost",
+        )
+        self.assertTrue(status.lost(), "game not lost after opening a mine")
+
+
+class TestGame(unittest.TestCase):
+    def test_game_first_open_is_safe(self):
+        for _ in range(20):
+            game = minesweeper.Game(9, 10)
+            game.open(4, 4)
+            self.assertFalse(game.lost(), "first opened tile was a mine")
+            self.assertEqual(game.mines.sum(), 10, "incorrect number of mines")
+        self.assertEqual(game.state.dtype, np.int8, "state is not stored as int8")
+        self.assertEqual(game.mines.dtype, np.uint8, "mines are not stored as uint8")
+        self.assertFalse(hasattr(game, "__dict__"), "game is not using __slots__")
+
+    def test_game_matches_board_functions(self):
+        m_indices = [(0, 2), (1, 2), (2, 2)]
+        board = init_test_board(5, m_indices)
+        game = minesweeper.Game(5, 3, board)
+        game.open(0, 0)
+        expected_val = minesweeper.open_tile(
+            minesweeper.init_board_state(5), board, 0, 0
+        )
+        self.assertTrue(
+            (game.state == expected_val).all(),
+            f"expected {expected_val} but got {game.state}",
+        )
+
+    def test_game_chord(self):
+        m_indices = [(0, 0)]
+        board = init_test_board(3, m_indices)
+        game = minesweeper.Game(3, 1, board)
+        game.open(1, 1)
+        game.flag(0, 0)
+        actual_val = game.chord(1, 1)
+        expected_val = {(0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1), (2, 2)}
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+        self.assertTrue(game.won(), "game not won after chording every tile")
+
+
+class TestBatchBoards(unittest.TestCase):
+    def test_batch_reset(self):
+        boards = batch.BatchBoards(50, 9, 10, np.random.default_rng(0))
+        rows = np.arange(50) % 9
+        cols = np.arange(50) // 9
+        boards.reset(rows, cols)
+        self.assertTrue(
+            (boards.mines.sum(axis=(1, 2)) == 10).all(),
+            "incorrect number of mines in a board",
+        )
+        self.assertFalse(
+            boards.mines[np.arange(50), rows, cols].any(),
+            "first tile should be empty",
+        )
+
+    def test_batch_open_matches_game(self):
+        boards = batch.BatchBoards(20, 9, 10, np.random.default_rng(1))
+        rows = np.full(20, 4)
+        cols = np.full(20, 4)
+        boards.reset(rows, cols)
+        opened = boards.open(rows, cols)
+        for i in range(20):
+            game = minesweeper.Game(9, 10, boards.mines[i])
+            expected_val = game.open(4, 4)
+            actual_val = {tuple(x) for x in np.argwhere(opened[i])}
+            self.assertEqual(
+                actual_val,
+                expected_val,
+                f"expected {expected_val} but got {actual_val}",
+            )
+            self.assertTrue(
+                (boards.state[i] == game.state).all(),
+                f"expected {game.state} but got {boards.state[i]}",
+            )
+        self.assertFalse(boards.lost().any(), "first opened tile was a mine")
+
+    def test_batch_flag_and_lost(self):
+        boards = batch.BatchBoards(2, 3, 1)
+        boards.mines[:, 0, 0] = 1
+        boards.counts[:] = minesweeper.neighbour_sum(boards.mines)
+        boards.flag(np.array([0, 0]), np.array([0, 0]), np.array([True, False]))
+        boards.open(np.array([0, 0]), np.array([0, 0]))
+        actual_val = boards.lost()
+        expected_val = np.array([False, True])
+        self.assertTrue(
+            (actual_val == expected_val).all(),
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+
+class TestGenerateDataParallel(unittest.TestCase):
+    def test_generate_data_parallel_reproducible(self):
+        first = minesweeper.generate_data_parallel(
+            9, 10, 1, 1, 6, workers=1, seed=3, chunk_size=2
+        )
+        second = minesweeper.generate_data_parallel(
+            9, 10, 1, 1, 6, workers=2, seed=3, chunk_size=2
+        )
+        self.assertEqual(len(first), 6, f"expected 6 games but got {len(first)}")
+        self.assertEqual(first.dtype.names, ("wins", "times", "move_counts"))
+        self.assertTrue(
+            (first["wins"] == second["wins"]).all()
+            and (first["move_counts"] == second["move_counts"]).all(),
+            f"expected {first} but got {second}",
+        )
+
+
+class TestSolverSession(unittest.TestCase):
+    def test_interleaved_sessions_are_independent(self):
+        # a 1-2-1 pattern queues three certain moves
+        board_a = init_test_board(3, [(1, 0), (1, 2)])
+        state_a = init_test_board_state(3, [], [(0, 0), (0, 1), (0, 2)], board_a)
+        board_b = init_test_board(2, [(1, 1)])
+        state_b = init_test_board_state(2, [], [(0, 0), (0, 1), (1, 0)], board_b)
+        session_a = heuristic_model.SolverSession()
+        session_b = heuristic_model.SolverSession()
+        actual_val = [session_a.next_move(state_a, True, 2, 1, 1)]
+        move_b = session_b.next_move(state_b, True, 1, 1, 1)
+        self.assertEqual(move_b, ("flag", 1, 1), f"expected a flag but got {move_b}")
+        actual_val.append(session_a.next_move(state_a, False, 2, 1, 1, set()))
+        actual_val.append(session_a.next_move(state_a, False, 2, 1, 1, set()))
+        expected_val = [("flag", 1, 0), ("flag", 1, 2), ("open", 1, 1)]
+        self.assertEqual(
+            sorted(actual_val),
+            expected_val,
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+
+class TestGameLoop(unittest.TestCase):
+    def test_game_loop_is_quiet(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            minesweeper.game_loop("ai", 10, 9, 0, 0)
+        self.assertEqual(output.getvalue(), "", "headless game loop printed output")
+
+    def test_move_log_observer(self):
+        observer = minesweeper.MoveLogObserver()
+        won, move_count = minesweeper.game_loop("ai", 10, 9, 1, 1, observer)
+        self.assertEqual(
+            len(observer.moves),
+            move_count,
+            f"expected {move_count} moves but got {len(observer.moves)}",
+        )
+        self.assertTrue(
+            all(opp in ("open", "flag") for opp, _, _ in observer.moves),
+            f"unexpected move in {observer.moves}",
+        )
+
+
+class TestGameRecords(unittest.TestCase):
+    def test_write_and_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.rec")
+            final_states = []
+            with game_records.GameRecordWriter(path) as writer:
+                for _ in range(3):
+                    game = minesweeper.Game(9, 10)
+                    for opp, r, c in [("open", 4, 4), ("flag", 0, 0), ("open", 8, 8)]:
+                        getattr(game, opp)(r, c)
+                        writer.on_move(game, opp, r, c, "human")
+                    writer.on_end(game, game.won(), 3)
+                    final_states.append((game.mines.copy(), game.state.copy()))
+            reader = game_records.GameRecordReader(path)
+            self.assertEqual(
+                len(reader), 3, f"expected 3 records but got {len(reader)}"
+            )
+            for record, (mines, state) in zip(reader, final_states):
+                self.assertEqual(record.first_move, (4, 4))
+                self.assertTrue((record.mines() == mines).all(), "mines differ")
+                actual_val = record.board_state_at()
+                self.assertTrue(
+                    (actual_val == state).all(),
+                    f"expected {state} but got {actual_val}",
+                )
+                actual_val = record.board_state_at(1)
+                expected_val = minesweeper.Game(9, 10, mines)
+                expected_val.open(4, 4)
+                self.assertTrue(
+                    (actual_val == expected_val.state).all(),
+                    f"expected {expected_val.state} but got {actual_val}",
+                )
+            del reader
+
+    def test_unknown_version(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.rec")
+            with open(path, "wb") as f:
+                f.write(game_records.magic + bytes([game_records.version + 1]))
+            with self.assertRaises(ValueError):
+                game_records.GameRecordReader(path)
+
+    def test_unknown_ops_are_skipped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.rec")
+            with game_records.GameRecordWriter(path) as writer:
+                game = minesweeper.Game(9, 10)
+                for opp, r, c in [("open", 4, 4), ("reveal", 0, 0), ("flag", 0, 0)]:
+                    writer.on_move(game, opp, r, c, "human")
+                writer.on_end(game, False, 3)
+            record = game_records.GameRecordReader(path)[0]
+            actual_val = record.moves.tolist()
+            expected_val = [(0, 4, 4), (1, 0, 0)]
+            self.assertEqual(
+                actual_val,
+                expected_val,
+                f"expected {expected_val} but got {actual_val}",
+            )
+            del record
+
+
+class TestSeededGames(unittest.TestCase):
+    def test_same_seed_same_game(self):
+        first = minesweeper.MoveLogObserver()
+        second = minesweeper.MoveLogObserver()
+        actual_val = minesweeper.game_loop("ai", 40, 16, 1, 1, first, seed=7)
+        expected_val = minesweeper.game_loop("ai", 40, 16, 1, 1, second, seed=7)
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+        self.assertEqual(first.moves, second.moves, "seeded games played differently")
+
+    def test_fixed_board_and_first_click(self):
+        mines = minesweeper.init_board(9, 10, 4, 4, rng=np.random.default_rng(0))
+        observer = minesweeper.MoveLogObserver()
+        minesweeper.game_loop(
+            "ai", 10, 9, 1, 1, observer, seed=0, mines=mines, first_click=(4, 4)
+        )
+        actual_val = observer.moves[0]
+        expected_val = ("open", 4, 4)
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+
+    def test_generate_data_seeded(self):
+        first = minesweeper.generate_data(9, 10, 1, 1, 6, seed=5)
+        # the global random state must not change the seeded games
+        np.random.seed(0)
+        second = minesweeper.generate_data(9, 10, 1, 1, 6, seed=5)
+        actual_val = second["move_counts"]
+        expected_val = first["move_counts"]
+        self.assertTrue(
+            (actual_val == expected_val).all()
+            and (first["wins"] == second["wins"]).all(),
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+    def test_corpus_is_deterministic(self):
+        first = corpus.generate_corpus("beginner", 5, seed=3)
+        second = corpus.generate_corpus("beginner", 5, seed=3)
+        self.assertTrue((first["mines"] == second["mines"]).all(), "mines differ")
+        for mines, (r, c) in zip(first["mines"], first["first_clicks"]):
+            self.assertEqual(np.count_nonzero(mines == minesweeper.mine), 10)
+            self.assertNotEqual(mines[r, c], minesweeper.mine, "first click is a mine")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "beginner.npz")
+            corpus.save_corpus(path, first)
+            loaded = corpus.load_corpus(path)
+        self.assertTrue((loaded["mines"] == first["mines"]).all(), "mines differ")
+        actual_val = corpus.play_corpus(loaded, 1, 1, seed=1)["move_counts"]
+        expected_val = corpus.play_corpus(first, 1, 1, seed=1)["move_counts"]
+        self.assertTrue(
+            (actual_val == expected_val).all(),
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run_reports_every_benchmark(self):
+        results = benchmark.run(["beginner"], 1)
+        for name in ["open_tile", "next_move", "game_open", "game_status", "game"]:
+            self.assertIn("beginner/" + name, results)
+            self.assertGreater(results["beginner/" + name]["calls"], 0)
+
+    def test_run_on_saved_corpus(self):
+        boards = corpus.generate_corpus("beginner", 2, seed=5)
+        with tempfile.TemporaryDirectory() as directory:
+            corpus.save_corpus(os.path.join(directory, "beginner.npz"), boards)
+            results = benchmark.run(["beginner"], 10, corpus_dir=directory)
+        actual_val = results["beginner/open_tile"]["calls"]
+        self.assertEqual(actual_val, 2, f"expected 2 boards but got {actual_val}")
+
+    def test_find_regressions(self):
+        baseline = {"a": {"median_us": 10.0}, "b": {"median_us": 10.0}}
+        results = {
+            "a": {"median_us": 11.0},
+            "b": {"median_us": 13.0},
+            "c": {"median_us": 99.0},
+        }
+        actual_val = benchmark.find_regressions(results, baseline, 0.2)
+        expected_val = [("b", 10.0, 13.0)]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+
+
+class TestSolverStats(unittest.TestCase):
+    def test_generate_data_stats(self):
+        stats = solver_stats.SolverStats(keep_games=True)
+        data = minesweeper.generate_data(9, 10, 1, 1, 3, stats=stats)
+        counters = stats.counters
+        self.assertEqual(counters["games"], 3)
+        self.assertEqual(len(stats.games), 3)
+        actual_val = counters["moves"]
+        expected_val = sum(game["counters"]["moves"] for game in stats.games)
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+        actual_val = counters["queue_moves"] + counters["certain_moves"]
+        actual_val += counters["local_moves"]
+        self.assertEqual(
+            actual_val,
+            counters["moves"],
+            f"expected {counters['moves']} moves by source but got {actual_val}",
+        )
+        self.assertEqual(counters["wins"], data["wins"].sum())
+        self.assertGreater(stats.timings["move"], 0)
+        self.assertIn("component_cells", stats.as_dict()["histograms"])
+
+    def test_merge(self):
+        first = solver_stats.SolverStats()
+        second = solver_stats.SolverStats()
+        first.count("moves", 2)
+        second.count("moves", 3)
+        second.add_time("solve", 0.000003)
+        first.merge(second)
+        actual_val = first.as_dict()
+        expected_val = {
+            "counters": {"moves": 5},
+            "timings": {"solve": 0.000003},
+            "histograms": {"solve_us": {4: 1}},
+        }
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+
+
+class TestAnalyzeMatrix(unittest.TestCase):
+    def test_reduced_rows(self):
+        board_state = np.array([[-1, -1, -1], [1, 2, 1], [0, 0, 0]])
+        board_rep = np.zeros((9, 10))
+        # x00 - x02 = 1, -x01 = -1 and x00 = 1, with an empty row first
+        board_rep[3, 9] = 0
+        board_rep[4, [0, 2, 9]] = [1, -1, 1]
+        board_rep[5, [1, 9]] = [-1, -1]
+        board_rep[6, [0, 9]] = [1, 1]
+        actual_val = list(heuristic_model.analyze_matrix(board_rep, board_state))
+        expected_val = [("flag", 0, 0), ("open", 0, 2), ("flag", 0, 1)]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+
+
+class TestSinglePointMasks(unittest.TestCase):
+    def test_masks(self):
+        board_state = np.array([[-1, -1, -1], [-2, 2, 1], [1, 1, 0]])
+        # the flag satisfies (2, 0) but no number is decided yet
+        mines, safe = csp.single_point_masks(board_state)
+        self.assertEqual(np.argwhere(mines).tolist(), [])
+        actual_val = np.argwhere(safe).tolist()
+        expected_val = []
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+        board_state[1, 1] = 1
+        actual_val = list(heuristic_model.SP_solver(board_state))
+        expected_val = [("open", 0, 0), ("open", 0, 1), ("open", 0, 2)]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+
+    def test_batch_matches_single_boards(self):
+        rng = np.random.default_rng(0)
+        states = []
+        for _ in range(4):
+            game = minesweeper.Game(9, 10, rng=rng)
+            game.open(4, 4)
+            states.append(game.state.copy())
+        mines, safe = csp.single_point_masks(np.array(states))
+        for i, state in enumerate(states):
+            expected_mines, expected_safe = csp.single_point_masks(state)
+            self.assertTrue((mines[i] == expected_mines).all(), "mines differ")
+            self.assertTrue((safe[i] == expected_safe).all(), "safe tiles differ")
+
+
+class TestLocalProbabilityMap(unittest.TestCase):
+    def test_conflicts(self):
+        # (1, 0) gives (0, 1) a probability of 1, which is then replaced by the 1 / 2
+        # of (1, 1) as if unassigned, while the 1 / 3 of (1, 2) loses the conflict
+        board_state = np.array([[0, -1, -1, -1], [1, 1, 1, 0], [0, 0, 0, 0]])
+        actual_val = heuristic_model.local_probability_map(board_state, 2)
+        expected_val = np.array([[2, 1 / 2, 1 / 2, 1 / 3], [2] * 4, [2] * 4])
+        self.assertTrue(
+            (actual_val == expected_val).all(),
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+    def test_unknown_set(self):
+        # the frontier is expected to hold 1 of the 3 mines, the other 2 are shared by
+        # the 3 tiles of the last column
+        board_state = np.full((3, 4), -1)
+        board_state[1, 1] = 1
+        actual_val = heuristic_model.local_probability_map(board_state, 3)
+        expected_val = np.full((3, 4), 1 / 8)
+        expected_val[:, 3] = 2 / 3
+        expected_val[1, 1] = 2
+        self.assertTrue(
+            np.allclose(actual_val, expected_val),
+            f"expected {expected_val} but got {actual_val}",
+        )
+        r, c = heuristic_model.select_tile_with_lowest_local_probability(
+            board_state, 3, np.random.default_rng(0)
+        )
+        self.assertEqual(expected_val[r, c], 1 / 8, f"selected ({r}, {c})")
+
+
+class TestLookaheadGuess(unittest.TestCase):
+    def test_prefers_openings(self):
+        board_state = np.full((5, 5), -1)
+        r, c = heuristic_model.select_tile_with_best_lookahead(
+            board_state, 5, rng=np.random.default_rng(0)
+        )
+        self.assertIn((r, c), [(0, 0), (0, 4), (4, 0), (4, 4)], "did not pick a corner")
+
+    def test_ties_are_broken_at_random(self):
+        board_state = np.full((22, 22), -1)
+        board_state[11, 11] = 5
+        actual_val = set()
+        for seed in range(20):
+            r, c = heuristic_model.select_tile_with_best_lookahead(
+                board_state, 99, rng=np.random.default_rng(seed)
+            )
+            actual_val.add((int(r), int(c)))
+        expected_val = {(0, 0), (0, 21), (21, 0), (21, 21)}
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+
+    def test_prefers_safe_tiles(self):
+        # the 1-2-1 makes (0, 1) safe, so it is the only candidate
+        board_state = np.array([[-1, -1, -1], [1, 2, 1], [0, 0, 0]])
+        r, c = heuristic_model.select_tile_with_best_lookahead(board_state, 2)
+        self.assertEqual((r, c), (0, 1), f"expected (0, 1) but got {(r, c)}")
+
+    def test_correlated_neighbours(self):
+        # (1, 3) and (2, 2) are safe. The 1 at (0, 1) puts exactly one mine on (0, 2) and
+        # (1, 2), both neighbours of (1, 3), so (1, 3) can never reveal a 0, while (2, 2)
+        # does in 1 of 20 cases. Taken as independent, (0, 2) and (1, 2) would give (1, 3)
+        # a 1 in 4 chance instead.
+        board_state = np.array(
+            [[0, 1, -1, 1], [1, 2, -1, -1], [-1, -1, -1, -1], [-1, -1, -1, -1]]
+        )
+        for seed in range(5):
+            r, c = heuristic_model.select_tile_with_best_lookahead(
+                board_state, 3, rng=np.random.default_rng(seed)
+            )
+            self.assertEqual((r, c), (2, 2), f"expected (2, 2) but got {(r, c)}")
+
+    def test_game_loop(self):
+        observer = minesweeper.MoveLogObserver()
+        won, move_count = minesweeper.game_loop("ai", 10, 9, 1, 3, observer, seed=0)
+        self.assertEqual(len(observer.moves), move_count)
+
+
+class TestVecDQEnvironment(unittest.TestCase):
+    def test_step(self):
+        env = DQN_Env.VecDQEnvironment(3, 5, 9, seed=0)
+        board_state = env.reset()
+        self.assertEqual(board_state.shape, (3, 9, 9))
+        self.assertTrue((board_state >= 0).any(axis=(1, 2)).all(), "nothing opened")
+        boards = env.boards
+        opened = np.argmax((board_state >= 0).reshape(3, -1), axis=1)
+        mine = np.argmax((boards.mines == minesweeper.mine).reshape(3, -1), axis=1)
+        actions = np.array([opened[0], mine[1], opened[2]])
+        actions[2] = np.flatnonzero(
+            (board_state[2] == -1).ravel()
+            & (boards.mines[2] != minesweeper.mine).ravel()
+        )[0]
+        old_state = board_state
+        board_state, rewards, done = env.step(actions)
+        self.assertEqual(rewards[0], env.rewards["no_progress"])
+        self.assertEqual(rewards[1], env.rewards["lose"])
+        self.assertIn(
+            rewards[2],
+            [env.rewards["guess"], env.rewards["progress"], env.rewards["win"]],
+        )
+        self.assertEqual(done[:2].tolist(), [False, True])
+        self.assertTrue(
+            (env.final_state[1] == old_state[1]).sum() >= 80, "final state not kept"
+        )
+        # the lost board was reset and its new first tile opened
+        self.assertFalse(boards.lost()[1], "lost board was not reset")
+        self.assertTrue((board_state[1] >= 0).any(), "reset board has no open tile")
+        self.assertEqual(env.total_moves, 3)
+
+
+class TestSumTree(unittest.TestCase):
+    def test_update_and_find(self):
+        tree = sum_tree.SumTree(5)
+        tree.update([0, 1, 2, 3, 4], [1, 2, 3, 0, 4])
+        self.assertEqual(tree.total(), 10)
+        actual_val = tree.find([0, 0.5, 1.5, 3, 5.9, 6.1, 10]).tolist()
+        # the leaf with priority 0 is never found
+        expected_val = [0, 0, 1, 1, 2, 4, 4]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+        tree.update([4, 1], [0, 5])
+        self.assertEqual(tree.total(), 9)
+        self.assertEqual(tree.get([1, 4]).tolist(), [5, 0])
+
+    def test_zero_priorities_are_never_found(self):
+        tree = sum_tree.SumTree(4)
+        tree.update(np.arange(4), [0, 1, 1, 0])
+        actual_val = tree.find([0.0, 1.0, 2.0]).tolist()
+        expected_val = [1, 1, 2]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+
+    def test_sampling_is_proportional(self):
+        rng = np.random.default_rng(0)
+        priorities = rng.random(100)
+        tree = sum_tree.SumTree(100)
+        tree.update(np.arange(100), priorities)
+        leaves = tree.find(rng.random(100000) * tree.total())
+        actual_val = np.bincount(leaves, minlength=100) / 100000
+        expected_val = priorities / priorities.sum()
+        self.assertTrue(
+            np.allclose(actual_val, expected_val, atol=0.005),
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+
+class TestDQEnvironment(unittest.TestCase):
+    def test_step_rewards(self):
+        env = DQN_Env.DQEnvironment(10, 9, seed=0)
+        env.reset()
+        valid = env.valid_actions()
+        self.assertTrue((valid == (env.board_state.ravel() == -1)).all())
+        safe = np.flatnonzero(valid & (env.board.ravel() != minesweeper.mine))[0]
+        board_state, reward, done = env.step(safe)
+        self.assertNotEqual(
+            reward, env.rewards["no_progress"], "opening a new tile made no progress"
+        )
+        self.assertFalse(env.valid_actions()[safe], "opened tile is still valid")
+        board_state, reward, done = env.step(safe)
+        self.assertEqual(reward, env.rewards["no_progress"])
+
+    def test_vec_valid_actions(self):
+        env = DQN_Env.VecDQEnvironment(2, 5, 9, seed=0)
+        board_state = env.reset()
+        actual_val = env.valid_actions()
+        expected_val = board_state.reshape(2, -1) == -1
+        self.assertTrue(
+            (actual_val == expected_val).all(),
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+
+"""push one transition per value in [values] to a replay [memory]: the state is filled with
+the value, the next state with the value + 1, the action and reward are the value and the
+transition is done if the value is odd."""
+
+
+def push_transitions(memory, values, num_tiles=3):
+    values = torch.tensor(values)
+    state = values.view(-1, 1).repeat(1, num_tiles).float()
+    return memory.push(
+        state, values.view(-1, 1), state + 1, values.float(), values % 2 == 1
+    )
+
+
+@unittest.skipUnless(torch is not None, "torch is not installed")
+class TestTensorReplayMemory(unittest.TestCase):
+    def test_push_wraps_around(self):
+        memory = replay_memory.TensorReplayMemory(5, 3)
+        push_transitions(memory, [0, 1, 2])
+        actual_val = push_transitions(memory, [3, 4, 5, 6]).tolist()
+        expected_val = [3, 4, 0, 1]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+        self.assertEqual(len(memory), 5)
+        self.assertEqual(memory.position, 2)
+        actual_val = memory.states[:, 0].tolist()
+        expected_val = [5, 6, 2, 3, 4]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+        self.assertEqual(memory.actions.tolist(), expected_val)
+        self.assertEqual(memory.next_states[:, 0].tolist(), [6, 7, 3, 4, 5])
+
+    def test_sample_shapes_and_dtypes(self):
+        memory = replay_memory.TensorReplayMemory(10, 3)
+        push_transitions(memory, [0, 1, 2, 3])
+        states, actions, rewards, next_states, dones, weights, indices = memory.sample(
+            8
+        )
+        actual_val = [
+            (tuple(tensor.shape), tensor.dtype)
+            for tensor in (states, actions, rewards, next_states, dones, weights)
+        ]
+        expected_val = [
+            ((8, 3), torch.float32),
+            ((8, 1), torch.int64),
+            ((8,), torch.float32),
+            ((8, 3), torch.float32),
+            ((8,), torch.bool),
+            ((8,), torch.float32),
+        ]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+        self.assertTrue(((indices >= 0) & (indices < 4)).all())
+        self.assertTrue((weights == 1).all())
+        self.assertTrue((states[:, 0] == indices).all())
+        self.assertTrue((actions.view(-1) == indices).all())
+        self.assertTrue((next_states == states + 1).all())
+
+    def test_done_mask(self):
+        memory = replay_memory.TensorReplayMemory(10, 3)
+        push_transitions(memory, [0, 1, 2, 3, 4])
+        dones = memory.gather(torch.arange(5))[4]
+        actual_val = dones.tolist()
+        expected_val = [False, True, False, True, False]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+        states, _, _, _, dones, _, _ = memory.sample(32)
+        self.assertTrue((dones == (states[:, 0] % 2 == 1)).all())
+
+
+@unittest.skipUnless(torch is not None, "torch is not installed")
+class TestPrioritizedReplayMemory(unittest.TestCase):
+    def test_push_gets_max_priority(self):
+        memory = replay_memory.PrioritizedReplayMemory(8, 3, alpha=1, epsilon=0)
+        indices = push_transitions(memory, [0, 1, 2, 3])
+        self.assertEqual(memory.priorities.get(indices.numpy()).tolist(), [1] * 4)
+        memory.update_priorities(torch.tensor([0, 1]), torch.tensor([3.0, -0.5]))
+        self.assertEqual(memory.max_priority, 3)
+        indices = push_transitions(memory, [4, 5])
+        actual_val = memory.priorities.get(np.arange(6)).tolist()
+        expected_val = [3, 0.5, 1, 1, 3, 3]
+        self.assertEqual(
+            actual_val, expected_val, f"expected {expected_val} but got {actual_val}"
+        )
+
+    def test_update_priorities_changes_sampling(self):
+        np.random.seed(0)
+        memory = replay_memory.PrioritizedReplayMemory(4, 3, alpha=1, epsilon=0)
+        push_transitions(memory, [0, 1, 2, 3])
+        indices = memory.sample(10000)[6]
+        actual_val = np.bincount(indices.numpy(), minlength=4) / 10000
+        self.assertTrue(np.allclose(actual_val, 0.25, atol=0.01))
+        memory.update_priorities(torch.arange(4), torch.tensor([1.0, 2, 3, 4]))
+        indices = memory.sample(10000)[6]
+        actual_val = np.bincount(indices.numpy(), minlength=4) / 10000
+        expected_val = np.array([0.1, 0.2, 0.3, 0.4])
+        self.assertTrue(
+            np.allclose(actual_val, expected_val, atol=0.01),
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+    def test_weights_are_normalized(self):
+        np.random.seed(0)
+        memory = replay_memory.PrioritizedReplayMemory(
+            4, 3, alpha=1, beta=0.4, epsilon=0
+        )
+        push_transitions(memory, [0, 1, 2, 3])
+        memory.update_priorities(torch.arange(4), torch.tensor([1.0, 2, 3, 4]))
+        weights, indices = memory.sample(64)[5:]
+        self.assertEqual(weights.max().item(), 1)
+        # the least likely transition has the largest weight
+        self.assertTrue((weights[indices == 0] == 1).all())
+        actual_val = weights[indices == 3]
+        expected_val = 4**-0.4
+        self.assertTrue(
+            torch.allclose(actual_val, torch.tensor(expected_val)),
+            f"expected {expected_val} but got {actual_val}",
+        )
+
+
+@unittest.skipUnless(torch is not None, "torch is not installed")
+class TestSoftUpdate(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.source = network.DQN(4, 3, 5)
+        self.target = network.DQN(4, 3, 5)
+
+    def test_matches_polyak_average(self):
+        tau = 0.1
+        expected_val = [
+            tau * source + (1 - tau) * target
+            for source, target in zip(
+                self.source.parameters(), self.target.parameters()
+            )
+        ]
+        network.soft_update(self.target, self.source, tau)
+        for actual, expected in zip(self.target.parameters(), expected_val):
+            self.assertTrue(
+                torch.allclose(actual, expected),
+                f"expected {expected} but got {actual}",
+            )
+
+    def test_compounded_tau(self):
+        tau = 0.05
+        once = network.DQN(4, 3, 5)
+        once.load_state_dict(self.target.state_dict())
+        for _ in range(10):
+            network.soft_update(self.target, self.source, tau)
+        network.soft_update(once, self.source, network.soft_update_tau(tau, 10))
+        for actual, expected in zip(once.parameters(), self.target.parameters()):
+            self.assertTrue(
+                torch.allclose(actual, expected, atol=1e-6),
+                f"expected {expected} but got {actual}",
+            )
+
+
 if __name__ == "__main__":
     unittest.main()